@@ -1,5 +1,4 @@
-import os, shutil
-from psutil import NoSuchProcess
+import os
 from threading import Timer
 import webbrowser
 import logging
@@ -16,6 +15,7 @@ from dash import (
 from dash.long_callback import DiskcacheLongCallbackManager
 import diskcache
 import dash_bootstrap_components as dbc
+from flask import Response
 
 from helpers import (
     check_chrome_exe_path,
@@ -26,19 +26,15 @@ from helpers import (
     check_chrome_driver_exe_path,
 )
 
-from selenium_init import Driver
-from marktguru_scraper import set_location, launch_scraper, generate_output
+# Selenium, pandas and openpyxl are only imported once a scrape starts
+from page_cache import SIZE_LIMIT
+from checkpoint import Journal
+from metrics import METRICS, METRICS_KEY, render, log_to_file
 
 
 # ---------------------------
-try:
-    shutil.rmtree("cache")
-    shutil.rmtree("Chrome")
-except (PermissionError, FileNotFoundError):
-    pass
-
-
-cache = diskcache.Cache("./cache")
+# Also keeps the scraped pages between runs, see page_cache
+cache = diskcache.Cache("./cache", size_limit=SIZE_LIMIT)
 long_callback_manager = DiskcacheLongCallbackManager(cache)
 
 
@@ -118,6 +114,11 @@ def App() -> None:
                     dbc.Input(
                         value="10713", size="md", className="mb-3", id="zip-input"
                     ),
+                    dbc.Tooltip(
+                        "Separate several ZIP codes with commas to compare the locations in one run",
+                        target="zip-input",
+                        placement="right",
+                    ),
                 ]
             ),
             html.Div(
@@ -135,6 +136,26 @@ def App() -> None:
                     ),
                 ]
             ),
+            html.Div(
+                [
+                    dbc.Label("Compare prices"),
+                    dbc.RadioItems(
+                        options=[
+                            {"label": "Per kg / l / piece", "value": "unit"},
+                            {"label": "Per pack", "value": "pack"},
+                        ],
+                        value="unit",
+                        id="compare-input",
+                        className="mb-3",
+                        inline=True,
+                    ),
+                    dbc.Tooltip(
+                        "The unit price is read from the base price, the unit or the pack size in the name, offers without one are compared by their pack price",
+                        target="compare-input",
+                        placement="right",
+                    ),
+                ]
+            ),
             html.Div(
                 [
                     dbc.Label("Margin of error"),
@@ -148,6 +169,41 @@ def App() -> None:
                     ),
                 ],
                 id="styled-numeric-input",
+                className="mb-3",
+            ),
+            html.Div(
+                [
+                    dbc.Label("Browser instances"),
+                    dbc.Input(
+                        type="number", value=1, min=1, max=8, step=1, id="workers-input"
+                    ),
+                    dbc.Tooltip(
+                        "The number of headless browsers scraping the shopping list in parallel",
+                        target="workers-input",
+                        placement="right",
+                    ),
+                ],
+                className="mb-3",
+            ),
+            html.Div(
+                [
+                    dbc.Label("Fetch engine"),
+                    dbc.RadioItems(
+                        options=[
+                            {"label": "Browser", "value": "selenium"},
+                            {"label": "HTTP", "value": "http"},
+                            {"label": "Async HTTP", "value": "async"},
+                        ],
+                        value="selenium",
+                        id="engine-input",
+                        inline=True,
+                    ),
+                    dbc.Tooltip(
+                        "HTTP requests the search pages directly with the location saved by the browser",
+                        target="engine-input",
+                        placement="right",
+                    ),
+                ],
                 className="mb-4",
             ),
             html.Div(
@@ -205,7 +261,7 @@ def App() -> None:
                                         dbc.Textarea(
                                             style={"height": "16rem"},
                                             draggable=False,
-                                            placeholder="Put items you don't want to see in search results here. Temporarily unlist an item by prepending '#' to the name",
+                                            placeholder="Put items you don't want to see in search results here. Temporarily unlist an item by prepending '#' to the name. Also: contains:part, words:any order, glob:*part*, re:regex",
                                             id="item-blacklist",
                                         ),
                                     ]
@@ -214,6 +270,16 @@ def App() -> None:
                         ],
                         class_name="mb-4",
                     ),
+                    html.Div(
+                        [
+                            dbc.Checkbox(
+                                label="Resume the last interrupted run",
+                                value=False,
+                                id="resume-input",
+                            ),
+                        ],
+                        className="d-flex justify-content-center mb-2",
+                    ),
                     html.Div(
                         [
                             dbc.Button(
@@ -272,7 +338,10 @@ def App() -> None:
         Output("path-input", "value"),
         Output("zip-input", "value"),
         Output("lp-input", "value"),
+        Output("compare-input", "value"),
         Output("moe-input", "value"),
+        Output("workers-input", "value"),
+        Output("engine-input", "value"),
         Input("store", "modified_timestamp"),
         State("store", "data"),
     )
@@ -281,7 +350,10 @@ def App() -> None:
             "path": "C:\Program Files\Google\Chrome\Application\chrome.exe",
             "zip": "10713",
             "lp": "Item",
+            "compare": "unit",
             "moe": 0,
+            "workers": 1,
+            "engine": "selenium",
         }
 
         data = data or d
@@ -290,7 +362,10 @@ def App() -> None:
             data.get("path"),
             data.get("zip"),
             data.get("lp"),
+            data.get("compare", "unit"),
             data.get("moe"),
+            data.get("workers", 1),
+            data.get("engine", "selenium"),
         )
 
     @app.callback(
@@ -299,19 +374,27 @@ def App() -> None:
         State("path-input", "value"),
         State("zip-input", "value"),
         State("lp-input", "value"),
+        State("compare-input", "value"),
         State("moe-input", "value"),
+        State("workers-input", "value"),
+        State("engine-input", "value"),
         State("store", "data"),
         Input("save-button", "n_clicks"),
         prevent_initial_call=True,
     )
-    def set_to_store(path_, zip_, lp, moe, store_data, n_clicks):
+    def set_to_store(
+        path_, zip_, lp, compare, moe, workers, engine, store_data, n_clicks
+    ):
         if n_clicks:
             store_data = store_data or {}
 
             store_data["path"] = path_
             store_data["zip"] = zip_
             store_data["lp"] = lp
+            store_data["compare"] = compare
             store_data["moe"] = int(moe)
+            store_data["workers"] = int(workers)
+            store_data["engine"] = engine
 
             return get_alert("Settings saved", "success"), store_data
 
@@ -360,9 +443,13 @@ def App() -> None:
             State("path-input", "value"),
             State("zip-input", "value"),
             State("lp-input", "value"),
+            State("compare-input", "value"),
             State("moe-input", "value"),
+            State("workers-input", "value"),
+            State("engine-input", "value"),
             State("shopping-list", "value"),
             State("item-blacklist", "value"),
+            State("resume-input", "value"),
         ],
         running=[
             (Output("scrape-button", "disabled"), True, False),
@@ -392,10 +479,27 @@ def App() -> None:
         path_,
         zip_,
         lp,
+        compare,
         moe,
+        workers,
+        engine,
         shopping_list,
         item_blacklist,
+        resume,
     ):
+        from psutil import NoSuchProcess
+
+        from browser_pool import BrowserPool
+        from marktguru_scraper import generate_output
+        from scraper_pool import iter_scraper_pool
+        from multi_zip import parse_zips, iter_scraper_zips
+        from offer_stream import OfferStream
+        from matcher import get_matcher
+        from history import HISTORY_DB
+        from retry import RetryPolicy
+
+        log_to_file()
+
         try:
             if (
                 n_clicks
@@ -411,31 +515,95 @@ def App() -> None:
                 if len(sl) == 0:
                     return get_alert("Shopping list is empty", "danger"), no_update, no_update
 
-                with Driver(path_, headless=True) as driver:
+                # A comma separated list of ZIPs scrapes every location
+                zips = parse_zips(zip_)
+                if len(zips) == 0:
+                    return get_alert("ZIP code is empty", "danger"), no_update, no_update
+
+                # Finished pages are journaled so a stopped run can be resumed
+                journals = {z: Journal(url, z, sl) for z in zips}
+                if not resume:
+                    for journal in journals.values():
+                        journal.clear()
+
+                # Offers are cleaned and filtered as the pages come in
+                data = OfferStream(get_matcher(ib, cache))
+
+                def collect(pages, location=""):
+                    for index, item, page, page_results in pages:
+                        data.add(page_results, (index, page))
+                        # The scrape runs in its own process, /metrics reads the cache
+                        METRICS.publish(cache)
+                        set_progress(
+                            (
+                                "Scraping",
+                                f"{location} '{item}' page {page + 1}",
+                                f" - {len(data)} offers so far",
+                                60,
+                            )
+                        )
+
+                # Warm browsers that outlive the scrape, see browser_pool
+                pool = BrowserPool()
+                policy = RetryPolicy()
+
+                if len(zips) == 1:
                     set_progress(("Setting location", "", "", 10))
-                    set_location(driver, sl[0], zip_)
-                    set_progress(("Location set", "", "", 25))
-
-                    set_progress(("Scraping", "", "", 60))
-                    # data = []
-                    # try:
-                    #     t = Thread(
-                    #         target=launch_scraper, args=(path_, url, moe, sl, data, zip_)
-                    #     )
-                    #     t.start()
-                    #     t.join()
-                    # except (KeyboardInterrupt):
-                    #     t.join()
-                    #     t.terminate()
-
-                    #     sys.exit()
-                    data = launch_scraper(driver, url, moe, sl, zip_)
+                    with pool.driver(path_, url, zips[0], sl[0]) as driver:
+                        if driver is None:
+                            return get_alert("Couldn't set the location", "danger"), no_update, no_update
+                        set_progress(("Location set", "", "", 25))
+
+                        set_progress(("Scraping", "", "", 60))
+                        collect(
+                            iter_scraper_pool(
+                                driver,
+                                path_,
+                                url,
+                                moe,
+                                sl,
+                                zips[0],
+                                int(workers or 1),
+                                engine,
+                                cache,
+                                journals[zips[0]],
+                                pool,
+                                policy,
+                            )
+                        )
+                else:
+                    # One browser or session per location, up to `workers` at once
+                    set_progress(("Scraping", f" {len(zips)} locations", "", 60))
+                    for z, *page in iter_scraper_zips(
+                        path_,
+                        url,
+                        moe,
+                        sl,
+                        zips,
+                        int(workers or 1),
+                        engine,
+                        cache,
+                        journals,
+                        pool,
+                        policy,
+                    ):
+                        collect([page], f" {z}")
                 set_progress(("Done scraping", "", "", 80))
+                print(f"Pages: {policy.summary()}")
 
                 set_progress(("Processing data", "", "", 90))
-                file = generate_output(data, lp, ib)
+                file = generate_output(data, lp, ib, zips[0], HISTORY_DB, compare)
+                METRICS.publish(cache, force=True)
                 set_progress(("Done", "", "", 100))
 
+                if len(policy.unscraped) > 0:
+                    # The journals are kept, a resumed scrape gets the missing items
+                    missing = ", ".join(f"{i} ({z})" for z, i in policy.unscraped)
+                    return get_alert(f"Done, not scraped: {missing}", "warning"), {"visibility": "visible"}, file
+
+                for journal in journals.values():
+                    journal.clear()
+
                 return get_alert("Done", "success"), {"visibility": "visible"}, file
 
         except ProcessLookupError:
@@ -453,7 +621,17 @@ def App() -> None:
             className="p-3",
         )
 
-    Timer(1, launch_app_mode).start()
+    # Counters and stage timings of the running or last scrape
+    @app.server.route("/metrics")
+    def metrics():
+        return Response(
+            render(cache.get(METRICS_KEY) or {}),
+            mimetype="text/plain; version=0.0.4",
+        )
+
+    # NO_BROWSER=1 only starts the server, e.g. for benchmarks/bench_startup.py
+    if not os.environ.get("NO_BROWSER"):
+        Timer(1, launch_app_mode).start()
 
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
@@ -461,4 +639,10 @@ def App() -> None:
 
 
 if __name__ == "__main__":
-    App()
+    try:
+        App()
+    finally:
+        # Stops the browsers kept warm between the scrapes
+        from browser_pool import BrowserPool
+
+        BrowserPool().close()
@@ -0,0 +1,320 @@
+import time
+import queue
+import asyncio
+import threading
+from urllib.parse import urlparse
+
+from marktguru_scraper import parse_page, parse_page_count, count_empty_results
+from http_engine import get_session, fetch_page
+from retry import RetryPolicy, EmptyResultsError
+from metrics import METRICS
+import page_cache
+
+CONCURRENCY = 8  # requests in flight
+RATE = 5.0  # requests per second to the same host
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Pipeline:
+    def __init__(
+        self,
+        url,
+        moe,
+        zip_,
+        concurrency=CONCURRENCY,
+        rate=RATE,
+        cache=None,
+        journal=None,
+        policy=None,
+    ):
+        self.url = url
+        self.moe = moe
+        self.zip_ = zip_
+        self.concurrency = concurrency
+        self.rate = rate
+        self.cache = cache
+        self.journal = journal
+        self.policy = policy or RetryPolicy()
+        self.on_page = None  # called with (item index, item, page, records)
+
+        self.session = get_session(zip_, pool_size=concurrency)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.buckets = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate)
+
+        return self.buckets[host]
+
+    # Stage 1
+    async def fetch(self, item: str, page: int) -> str:
+        await self.bucket(self.url).acquire()
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                return await asyncio.to_thread(
+                    fetch_page, self.session, self.url, item, page, self.zip_
+                )
+            finally:
+                METRICS.stage("fetch", start)
+
+    # Stage 2
+    async def parse(self, html: str, item: str) -> list:
+        start = time.perf_counter()
+        page_results = await asyncio.to_thread(parse_page, html, item)
+        METRICS.stage("parse", start)
+
+        return page_results
+
+    # Stage 3
+    def validate(self, page_results: list) -> bool:
+        return count_empty_results(page_results) <= self.moe
+
+    async def scrape_page(self, item: str, page: int, refresh: bool = False):
+        # Raises AssertionError when the page is past the last one and
+        # PageSkipped once the retry policy gives up on it
+        if self.cache is not None and not refresh:
+            cached = page_cache.get_page(self.cache, self.url, self.zip_, item, page)
+            if cached is not None:
+                assert not cached.get("last", False)
+                METRICS.inc("cached_pages")
+                return cached["html"], cached["records"], True
+
+        attempt = 0
+        while True:
+            self.policy.check(item, self.zip_)
+            try:
+                try:
+                    html = await self.fetch(item, page)
+                except AssertionError:
+                    if self.cache is not None:
+                        page_cache.set_last_page(
+                            self.cache, self.url, self.zip_, item, page
+                        )
+                    raise
+
+                page_results = await self.parse(html, item)
+                if not self.validate(page_results):
+                    raise EmptyResultsError(
+                        f"Got more than {self.moe} empty result(s)."
+                    )
+
+                self.policy.on_success(item, self.zip_)
+                empty = count_empty_results(page_results)
+                METRICS.inc("fetched_pages")
+                METRICS.inc("records", len(page_results))
+                METRICS.inc("empty_records", empty)
+                METRICS.event(
+                    "page",
+                    item=item,
+                    page=page,
+                    zip=self.zip_,
+                    records=len(page_results),
+                    empty=empty,
+                )
+
+                if self.cache is not None:
+                    page_cache.set_page(
+                        self.cache,
+                        self.url,
+                        self.zip_,
+                        item,
+                        page,
+                        html,
+                        page_results,
+                    )
+                return html, page_results, False
+            except Exception as e:
+                delay = self.policy.on_error(e, item, attempt, self.zip_)
+                print(
+                    "    ",
+                    f"'{item}' page {page + 1}: {e} Retrying in {delay:.1f} s...",
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def emit(self, index: int, item: str, page: int, page_results: list) -> None:
+        if self.on_page is not None:
+            self.on_page(index, item, page, page_results)
+
+    async def scrape_next_page(
+        self, index: int, item: str, page: int, refresh: bool = False
+    ):
+        # Returns None when the page is past the last one
+        try:
+            _, page_results, _ = await self.scrape_page(item, page, refresh)
+            self.emit(index, item, page, page_results)
+            return page_results
+        except AssertionError:
+            return None
+        except Exception as e:
+            print(e)
+            return []
+
+    async def scrape_item(self, index: int, item: str) -> list:
+        print("  ", f"Searching for '{item}'")
+
+        # Pages are scheduled all at once, so the checkpoint works per item here
+        if self.journal is not None and self.journal.is_done(item):
+            print("  ", f"'{item}': restored from the checkpoint")
+            data = self.journal.records(item)
+            self.emit(index, item, 0, data)
+            return data
+
+        try:
+            html, data, cached = await self.scrape_page(item, 0)
+        except AssertionError:
+            return []
+        except Exception as e:
+            print(e)
+            return []
+
+        first_page = list(data)
+        refresh = False
+        if self.cache is not None and not cached:
+            # Reuses the last results if the first page didn't change
+            snapshot = page_cache.get_item(self.cache, self.url, self.zip_, item)
+            if snapshot is not None and snapshot[
+                "fingerprint"
+            ] == page_cache.fingerprint(data):
+                print("  ", f"'{item}': no changes since the last run")
+                data = snapshot["records"]
+                if self.journal is not None:
+                    self.journal.add_page(item, 0, data)
+                    self.journal.finish_item(item)
+                self.emit(index, item, 0, data)
+                return data
+
+            # The offers changed - the cached pages after this one are outdated
+            refresh = True
+
+        self.emit(index, item, 0, first_page)
+
+        count = parse_page_count(html)
+        if count is not None:
+            # The page count is known - schedules all the remaining pages at once
+            pages = await asyncio.gather(
+                *(
+                    self.scrape_next_page(index, item, page, refresh)
+                    for page in range(1, count)
+                )
+            )
+            for page_results in pages:
+                data.extend(page_results or [])
+        else:
+            # No pagination links - fetches windows of pages until the last one
+            page = 1
+            while True:
+                pages = await asyncio.gather(
+                    *(
+                        self.scrape_next_page(index, item, p, refresh)
+                        for p in range(page, page + self.concurrency)
+                    )
+                )
+                if None in pages:
+                    pages = pages[: pages.index(None)]
+                for page_results in pages:
+                    data.extend(page_results)
+                if len(pages) < self.concurrency:
+                    break
+                if not any(pages):
+                    # Pages past the end may fail instead of missing the
+                    # headline, a window without any offers is the end too
+                    break
+                if self.policy.is_open(item, self.zip_):
+                    # Every further page would be skipped right away
+                    print("  ", f"'{item}': too many failed pages, skipping the rest")
+                    break
+
+                page += self.concurrency
+
+        if self.cache is not None:
+            page_cache.set_item(self.cache, self.url, self.zip_, item, first_page, data)
+
+        if self.journal is not None:
+            self.journal.add_page(item, 0, data)
+            self.journal.finish_item(item)
+
+        print("  ", f"'{item}': {len(data)} result(s)")
+
+        return data
+
+    async def run(self, shopping_list: list) -> list:
+        items = await asyncio.gather(
+            *(self.scrape_item(index, item) for index, item in enumerate(shopping_list))
+        )
+
+        # Keeps the order of the shopping list
+        return [result for results in items for result in results]
+
+
+def launch_scraper_async(
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    concurrency=CONCURRENCY,
+    rate=RATE,
+    cache=None,
+    journal=None,
+    policy=None,
+):
+    async def main():
+        pipeline = Pipeline(url, moe, zip_, concurrency, rate, cache, journal, policy)
+        return await pipeline.run(shopping_list)
+
+    return asyncio.run(main())
+
+
+def iter_scraper_async(
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    concurrency=CONCURRENCY,
+    rate=RATE,
+    cache=None,
+    journal=None,
+    policy=None,
+):
+    # Yields (item index, item, page, records) while the event loop runs in a thread
+    out = queue.Queue()
+
+    async def main():
+        pipeline = Pipeline(url, moe, zip_, concurrency, rate, cache, journal, policy)
+        pipeline.on_page = lambda *page: out.put(page)
+        await pipeline.run(shopping_list)
+
+    t = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    t.start()
+
+    while t.is_alive() or not out.empty():
+        try:
+            yield out.get(timeout=0.1)
+        except queue.Empty:
+            pass
@@ -0,0 +1,59 @@
+# Filters synthetic offers with a blacklist of every rule type, the first pass
+# compiles and matches every name, the second one reuses the matched names
+#
+#   python -m benchmarks.bench_matcher [offers] [rules]
+
+import sys
+import time
+import random
+
+from matcher import compile_rules, Matcher
+
+
+def synthetic_names(n: int, words: list, rng: random.Random) -> list:
+    return [" ".join(rng.sample(words, rng.randint(2, 6))) for _ in range(n)]
+
+
+def synthetic_rules(n: int, words: list, rng: random.Random) -> list:
+    # Mostly pasted product names, like the blacklists in use
+    patterns = n // 10
+    return (
+        synthetic_names(n - 4 * patterns, words, rng)
+        + [f"contains:{rng.choice(words)}" for _ in range(patterns)]
+        + [f"words:{rng.choice(words)} {rng.choice(words)}" for _ in range(patterns)]
+        + [f"glob:*{rng.choice(words)} ?" for _ in range(patterns)]
+        + [rf"re:^{rng.choice(words)}\b" for _ in range(patterns)]
+    )
+
+
+def main(offers: str = "100000", rules: str = "5000") -> None:
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyzäöü") for _ in range(8))
+        for _ in range(3000)
+    ]
+
+    # Offers repeat across pages, items and ZIPs
+    unique = synthetic_names(int(offers) // 5, words, rng)
+    names = [rng.choice(unique) for _ in range(int(offers))]
+    rules = synthetic_rules(int(rules), words, rng)
+
+    start = time.perf_counter()
+    matcher = Matcher(compile_rules(rules))
+    print(f"compile      {time.perf_counter() - start:8.3f} s, {len(rules)} rules")
+
+    for run in ["first", "second"]:
+        start = time.perf_counter()
+        blacklisted = sum(1 for name in names if matcher(name))
+        elapsed = time.perf_counter() - start
+        print(f"{run:<6} pass  {elapsed:8.3f} s, {blacklisted}/{len(names)} offers")
+
+    exact = set(rules)
+    start = time.perf_counter()
+    blacklisted = sum(1 for name in names if name in exact)
+    elapsed = time.perf_counter() - start
+    print(f"exact names  {elapsed:8.3f} s, {blacklisted}/{len(names)} offers")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,92 @@
+# Compares the row-wise post-processing of generate_output with the vectorized one
+#
+#   python -m benchmarks.bench_output [rows ...]
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from marktguru_scraper import parse_prices, flag_lowest_prices, blank_repeated
+
+
+def synthetic_offers(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    stores = np.array([f"store {i}" for i in range(100)])
+    items = np.array([f"item {i}" for i in range(40)])
+    cents = rng.integers(19, 2999, n)
+    prices = pd.Series(
+        [f"€ {c // 100},{c % 100:02d} " for c in cents], dtype=object
+    )
+    # A few prices that can't be read
+    prices[rng.random(n) < 0.01] = "€ ab "
+
+    df = pd.DataFrame(
+        {
+            "Store": stores[rng.integers(0, len(stores), n)],
+            "Item": items[rng.integers(0, len(items), n)],
+            "Name": [f"name {i}" for i in rng.integers(0, n // 4 + 1, n)],
+            "Price": prices,
+        }
+    )
+
+    return df
+
+
+# The implementation this replaced
+def legacy(df: pd.DataFrame, lp: str) -> pd.DataFrame:
+    def str_to_float(x: str) -> float:
+        try:
+            return float(x.split(" ")[1].replace(",", "."))
+        except ValueError:
+            return 999.9
+
+    df["Price"] = df["Price"].apply(lambda x: str_to_float(x))
+    df = df.sort_values(["Store", "Item", "Price"])
+
+    df["LP"] = df.groupby([lp])["Price"].transform("min")
+    df["Lowest price across stores"] = df.apply(
+        lambda x: f"✅ {x[lp]}" if x["LP"] == x["Price"] else "", axis=1
+    )
+    df = df.drop(["LP"], axis=1)
+
+    groups = []
+    for _, o in df.groupby("Store"):
+        o = o.copy()
+        o[["Store", "Item"]] = o[["Store", "Item"]].where(
+            o[["Store", "Item"]].apply(lambda x: x != x.shift()), ""
+        )
+        groups.append(o)
+
+    return pd.concat(groups)
+
+
+def vectorized(df: pd.DataFrame, lp: str) -> pd.DataFrame:
+    df["Price"] = parse_prices(df["Price"])
+    df = df.sort_values(["Store", "Item", "Price"])
+
+    df["Lowest price across stores"] = flag_lowest_prices(df, lp)
+
+    return blank_repeated(df)
+
+
+def timed(f, df, lp) -> float:
+    start = time.perf_counter()
+    f(df.copy(), lp)
+
+    return time.perf_counter() - start
+
+
+def main(sizes) -> None:
+    print(f"{'rows':>10} {'legacy s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for n in sizes:
+        df = synthetic_offers(n)
+        old = timed(legacy, df, "Item")
+        new = timed(vectorized, df, "Item")
+        print(f"{n:>10} {old:>10.3f} {new:>13.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,91 @@
+# Loads the same search pages with the full and the lean browser profile and
+# compares load times and bytes transferred, needs Chrome, chromedriver and
+# network access. Every page is loaded with the browser cache disabled
+#
+#   python -m benchmarks.bench_profile <chrome binary> [pages per item]
+
+import sys
+import json
+import time
+import statistics
+import tempfile
+
+from selenium.webdriver import Chrome
+
+from helpers import read_list
+from selenium_init import get_options, block_resources, execute_cdp_cmd
+
+
+URL = "https://www.marktguru.de/search"
+
+
+def new_driver(chrome_binary_location, lean: bool, profile: str):
+    options = get_options(chrome_binary_location, True, profile, lean)
+    capabilities = options.to_capabilities()
+    capabilities["goog:loggingPrefs"] = {"performance": "ALL"}
+
+    driver = Chrome(desired_capabilities=capabilities)
+    if lean:
+        block_resources(driver)
+    else:
+        execute_cdp_cmd(driver, "Network.enable")
+    execute_cdp_cmd(driver, "Network.setCacheDisabled", {"cacheDisabled": True})
+
+    return driver
+
+
+def transferred(driver) -> int:
+    # Bytes received since the last call, headers included
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.loadingFinished":
+            total += message["params"]["encodedDataLength"]
+
+    return total
+
+
+def measure(chrome_binary_location, lean: bool, urls: list) -> tuple:
+    times, sizes = [], []
+
+    # A fresh profile, so neither run benefits from the other's cookies
+    with tempfile.TemporaryDirectory() as profile:
+        driver = new_driver(chrome_binary_location, lean, profile)
+        try:
+            driver.get("about:blank")
+            transferred(driver)
+
+            for url in urls:
+                start = time.perf_counter()
+                driver.get(url)  # returns after the load event
+                times.append(time.perf_counter() - start)
+                sizes.append(transferred(driver))
+        finally:
+            driver.quit()
+
+    return times, sizes
+
+
+def main(chrome_binary_location: str, pages: str = "2") -> None:
+    with open("shopping_list.txt", "r", encoding="utf-8") as f:
+        items = read_list(f.read())[:5]
+
+    urls = [
+        f"{URL}/{item}?title={item}&page={page}"
+        for item in items
+        for page in range(int(pages))
+    ]
+
+    print(f"{len(urls)} pages")
+    for name, lean in [("full", False), ("lean", True)]:
+        times, sizes = measure(chrome_binary_location, lean, urls)
+        print(
+            f"{name:<5} load {statistics.median(times):6.2f} s/page (median), "
+            f"{sum(times):7.1f} s total, "
+            f"{statistics.median(sizes) / 1024:8.0f} KB/page (median), "
+            f"{sum(sizes) / 1024**2:7.1f} MB total"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,98 @@
+# Compares the old load_workbook/to_excel report writing with report.write_report,
+# every run happens in a fresh process to get its own peak memory
+#
+#   python -m benchmarks.bench_report [stores] [rows per store]
+
+import os
+import sys
+import time
+import subprocess
+import tempfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from report import write_report
+from benchmarks.util import peak_rss_mb
+
+
+COLUMNS = ["Store", "Item", "Name", "Brand", "Price", "Unit", "Date valid", "Note"]
+
+
+def synthetic_report(stores: int, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+
+    for s in range(stores):
+        yield pd.DataFrame(
+            {
+                "Store": [f"store {s}"] + [""] * (rows - 1),
+                "Item": [f"item {i}" for i in rng.integers(0, 40, rows)],
+                "Name": [f"name {i}" for i in rng.integers(0, 10_000, rows)],
+                "Brand": "brand",
+                "Price": rng.integers(19, 2999, rows) / 100,
+                "Unit": " kg",
+                "Date valid": "12.12. - 18.12.",
+                "Note": "",
+            },
+            columns=COLUMNS,
+        )
+
+
+# The implementation this replaced
+def legacy(path: str, groups) -> None:
+    pd.DataFrame().to_excel(path, index=False)
+
+    book = load_workbook(path)
+    writer = pd.ExcelWriter(path, engine="openpyxl")
+    writer.sheets.update({ws.title: ws for ws in book.worksheets})
+
+    for e, o in enumerate(groups):
+        if e == 0:
+            o.to_excel(writer, index=False)
+        else:
+            o.to_excel(
+                writer, startrow=writer.sheets["Sheet1"].max_row + 1, index=False
+            )
+
+    writer.close()
+
+
+def run(writer: str, stores: int, rows: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "report.xlsx")
+    groups = synthetic_report(stores, rows)
+
+    start = time.perf_counter()
+    if writer == "legacy":
+        legacy(path, groups)
+    else:
+        write_report(path, groups)
+    elapsed = time.perf_counter() - start
+
+    print(f"{writer:>8} {elapsed:>10.2f} {peak_rss_mb():>12.0f}")
+
+
+def main(stores: int, rows: int) -> None:
+    print(f"{stores} stores x {rows} rows")
+    print(f"{'writer':>8} {'seconds':>10} {'peak RSS MB':>12}")
+    for writer in ["legacy", "stream"]:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_report",
+                "--run",
+                writer,
+                str(stores),
+                str(rows),
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        args = [int(a) for a in sys.argv[1:]]
+        main(*(args + [100, 10_000][len(args) :]))
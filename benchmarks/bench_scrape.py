@@ -0,0 +1,124 @@
+# Scrapes the recorded search pages of benchmarks/stub_site end to end, without
+# network access: set_location, search_page, launch_scraper and generate_output.
+# The selenium engine needs Chrome and chromedriver, the http and async engines
+# start from a saved location instead
+#
+#   python -m benchmarks.bench_scrape [engine] [items] [pages per item] [chrome binary]
+
+import os
+import sys
+import json
+import time
+import tempfile
+import statistics
+
+from marktguru_scraper import (
+    LOCATION_STATE_DIR,
+    set_location,
+    search_page,
+    launch_scraper,
+    generate_output,
+)
+from metrics import METRICS
+from benchmarks.stub_site import serve, stub_url, location_state
+from benchmarks.util import peak_rss_mb
+
+
+ZIP = "10713"
+ITEMS = ["butter", "milch", "kaffee", "eier", "joghurt", "brot", "nudeln", "reis"]
+SEARCH_PAGES = 10  # single page loads timed with search_page
+
+
+def save_location(zip_: str) -> None:
+    os.makedirs(LOCATION_STATE_DIR, exist_ok=True)
+    with open(os.path.join(LOCATION_STATE_DIR, f"{zip_}.json"), "w") as f:
+        json.dump(location_state(zip_), f)
+
+
+def stage(snapshot: dict, name: str) -> tuple:
+    # (count, total seconds) of a stage
+    for (timing, labels), (count, total, _) in snapshot["timings"].items():
+        if timing == "stage_seconds" and labels == (("stage", name),):
+            return count, total
+
+    return 0, 0.0
+
+
+def run(engine: str, items: list, url: str, chrome_binary_location: str) -> None:
+    driver = None
+    if engine == "selenium":
+        from selenium_init import get_driver
+
+        driver = get_driver(chrome_binary_location, True, "Chrome")
+
+        start = time.perf_counter()
+        if not set_location(driver, items[0], ZIP, url):
+            raise RuntimeError("Couldn't set the location on the stub site")
+        print(f"set_location     {time.perf_counter() - start:8.2f} s")
+        session = driver
+    else:
+        from http_engine import get_session, search_page as http_search_page
+
+        save_location(ZIP)
+        session = get_session(ZIP)
+
+    try:
+        times = []
+        for page in range(SEARCH_PAGES):
+            start = time.perf_counter()
+            if engine == "selenium":
+                search_page(session, url, items[0], page % 2, ZIP)
+            else:
+                http_search_page(session, url, items[0], page % 2, ZIP)
+            times.append(time.perf_counter() - start)
+        print(f"search_page      {statistics.median(times) * 1000:8.1f} ms (median)")
+
+        METRICS.reset()
+        start = time.perf_counter()
+        records = launch_scraper(driver, url, 0, items, ZIP, engine)
+        elapsed = time.perf_counter() - start
+    finally:
+        if driver is not None:
+            driver.quit()
+
+    snapshot = METRICS.snapshot()
+    pages = sum(
+        v for (name, _), v in snapshot["counters"].items() if name == "fetched_pages"
+    )
+    parsed, parse_s = stage(snapshot, "parse")
+
+    start = time.perf_counter()
+    generate_output(records, "Item", [], ZIP)
+    output_s = time.perf_counter() - start
+
+    print(f"launch_scraper   {elapsed:8.2f} s, {pages} pages, {len(records)} offers")
+    print(f"pages/sec        {pages / elapsed:8.1f}")
+    print(f"parse            {parse_s / max(parsed, 1) * 1000:8.2f} ms/page")
+    print(f"generate_output  {output_s:8.3f} s")
+    print(f"peak RSS         {peak_rss_mb():8.0f} MB")
+
+
+def main(
+    engine: str = "http",
+    items: str = "4",
+    pages: str = "5",
+    chrome_binary_location: str = "",
+) -> None:
+    server = serve(pages=int(pages))
+    url = stub_url(server)
+    items = ITEMS[: int(items)]
+    print(f"{engine} engine, {len(items)} items, {pages} pages each, {url}")
+
+    # The locations and the report are written to the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as wd:
+        os.chdir(wd)
+        try:
+            run(engine, items, url, chrome_binary_location)
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
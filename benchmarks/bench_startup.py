@@ -0,0 +1,91 @@
+# Measures how long app.py takes to import and to serve its first page,
+# every run happens in a fresh process so nothing is cached in memory
+#
+#   python -m benchmarks.bench_startup [runs]
+
+import os
+import sys
+import time
+import statistics
+import subprocess
+import urllib.request
+
+
+LAYOUT_URL = "http://127.0.0.1:8050/_dash-layout"
+TIMEOUT = 60
+
+
+def import_time(module: str) -> tuple:
+    # Total import time of the module and its heaviest dependencies
+    r = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total, top, direct = 0.0, [], []
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        t = int(cumulative) / 1e6  # µs -> s
+
+        # Nested imports are indented by two spaces per level and are
+        # listed before the module that imports them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            direct.append((t, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                total, top = t, sorted(direct, reverse=True)[:5]
+            direct = []
+
+    return total, top
+
+
+def first_render_time() -> float:
+    # Until the server answers with the layout, which is what the
+    # browser needs to draw the page
+    env = dict(os.environ, NO_BROWSER="1")
+    start = time.perf_counter()
+    p = subprocess.Popen(
+        [sys.executable, "app.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        while time.perf_counter() - start < TIMEOUT:
+            if p.poll() is not None:
+                raise RuntimeError("app.py exited before serving the page")
+            try:
+                with urllib.request.urlopen(LAYOUT_URL, timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+
+        raise TimeoutError(f"no response from {LAYOUT_URL} in {TIMEOUT} s")
+    finally:
+        p.terminate()
+        p.wait()
+
+
+def main(runs: int = 5) -> None:
+    for module in ["app", "cli"]:
+        times = [import_time(module) for _ in range(runs)]
+        print(
+            f"import {module:<4} {statistics.median(t for t, _ in times):6.3f} s "
+            f"(median of {runs})"
+        )
+        for t, name in times[-1][1]:
+            print(f"    {name:<24} {t:6.3f} s")
+
+    render = [first_render_time() for _ in range(runs)]
+    print(f"first render {statistics.median(render):6.3f} s (median of {runs})")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
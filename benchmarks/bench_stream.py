@@ -0,0 +1,83 @@
+# Compares the peak memory of keeping the offers of a run as a list of dicts
+# and building the DataFrame from it with OfferStream's column buffers.
+# The same offers show up in every ZIP, like in a metro-wide run
+#
+#   python -m benchmarks.bench_stream [ZIPs] [offers per ZIP]
+
+import sys
+import time
+import random
+import tracemalloc
+
+import pandas as pd
+
+from offer_stream import OfferStream
+from parsers import offer_key
+
+
+STORES = ["ALDI Nord", "Lidl", "REWE", "EDEKA", "Netto", "Penny", "Kaufland"]
+BRANDS = ["ja!", "Gut & Günstig", "Milsani", "Rama", "Barilla", "K-Classic"]
+PAGE = 20  # offers per page
+
+
+def pages(zips: int, offers: int):
+    # Fresh strings for every card, like the parsers return them
+    for z in range(zips):
+        rng = random.Random(0)
+        zip_ = str(10115 + z)
+        for p in range(0, offers, PAGE):
+            page = [
+                {
+                    "Item": f"item {n % 40}",
+                    "Name": f"Product {n} {rng.choice(BRANDS)}".lower(),
+                    "Date valid": "12.12. - 18.12.".lower(),
+                    "Store": rng.choice(STORES).lower(),
+                    "Brand": rng.choice(BRANDS).lower(),
+                    "Price": f"€ {rng.randint(0, 29)},{rng.randint(0, 99):02d}".lower(),
+                    "Note": f"1 kg = € {rng.randint(1, 19)},99".lower(),
+                    "ZIP": zip_,
+                }
+                for n in range(p, min(p + PAGE, offers))
+            ]
+            for r in page:
+                r["Key"] = offer_key(r)
+
+            yield page
+
+
+def list_of_dicts(zips: int, offers: int) -> pd.DataFrame:
+    data = []
+    for page in pages(zips, offers):
+        data.extend(page)
+
+    return pd.DataFrame(data)
+
+
+def stream(zips: int, offers: int) -> pd.DataFrame:
+    data = OfferStream()
+    for page in pages(zips, offers):
+        data.add(page)
+
+    return data.to_frame()
+
+
+def measure(f, zips: int, offers: int) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = f(zips, offers)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(df), elapsed, peak / 1024**2
+
+
+def main(zips: str = "20", offers: str = "20000") -> None:
+    print(f"{'':<14} {'rows':>8} {'s':>7} {'peak MB':>8}")
+    for name, f in [("list of dicts", list_of_dicts), ("OfferStream", stream)]:
+        rows, elapsed, peak = measure(f, int(zips), int(offers))
+        print(f"{name:<14} {rows:>8} {elapsed:>7.2f} {peak:>8.0f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
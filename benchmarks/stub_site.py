@@ -0,0 +1,147 @@
+# A local stand-in for the marktguru search built from the recorded pages in
+# fixtures/: the location widget, the headline, the offer cards and the
+# pagination links. The offers are generated from the item and page, so
+# every run sees the same pages
+#
+#   python -m benchmarks.stub_site [port] [pages per item]
+
+import os
+import sys
+import random
+import threading
+from string import Template
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PAGES = 5  # per item, the page after the last one has no offers
+CARDS = 20  # per page
+DEFAULT_ZIP = "10115"  # shown until the location widget sets another one
+
+STORES = ["aldi nord", "lidl", "rewe", "edeka", "netto", "penny", "kaufland"]
+BRANDS = ["ja!", "gut & günstig", "milsani", "rama", "barilla", "bio", "k-classic"]
+UNITS = ["kg", "l", "stück"]
+
+
+def _fixture(name: str) -> Template:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return Template(f.read())
+
+
+SEARCH = _fixture("search.html")
+CARD = _fixture("card.html")
+CARD_STRONG = _fixture("card_strong.html")
+HOME = _fixture("home.html")
+
+
+def cards(item: str, page: int) -> str:
+    rng = random.Random(f"{item}-{page}")
+
+    html = []
+    for i in range(CARDS):
+        n = page * CARDS + i
+        cents = rng.randint(19, 1999)
+        fields = {
+            "n": n,
+            "name": f"{item.title()} {rng.choice(BRANDS)} {n}",
+            "brand": rng.choice(BRANDS),
+            "store": rng.choice(STORES),
+            "dates": "12.12. - 18.12.",
+            "price": f"{cents // 100},{cents % 100:02d}",
+            "unit": rng.choice(UNITS),
+            "note": f"1 kg = € {rng.randint(1, 19)},{rng.randint(0, 99):02d}",
+            "until": "18.12.",
+        }
+        html.append((CARD if i % 3 else CARD_STRONG).substitute(fields))
+
+    return "".join(html)
+
+
+def search_page(item: str, page: int, zip_: str, pages: int = PAGES) -> str:
+    if page < pages:
+        headline = f"Angebote für {item.title()}"
+        offers = cards(item, page)
+        pagination = "\n".join(
+            f'    <a href="/search/{item}?title={item}&amp;page={p}">{p + 1}</a>'
+            for p in range(pages)
+        )
+    else:
+        headline = "Leider keine passenden Angebote gefunden"
+        offers = pagination = ""
+
+    return SEARCH.substitute(
+        title=item,
+        item=item,
+        location=f"{zip_} Berlin",
+        headline=headline,
+        cards=offers,
+        pagination=pagination,
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    pages = PAGES
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        cookies = SimpleCookie(self.headers.get("Cookie", ""))
+        zip_ = cookies["zip"].value if "zip" in cookies else DEFAULT_ZIP
+
+        if url.path.startswith("/search/"):
+            item = query.get("title", [unquote(url.path[len("/search/") :])])[0]
+            page = int(query.get("page", ["0"])[0])
+            self.send(200, search_page(item, page, zip_, self.pages))
+        elif url.path == "/":
+            self.send(200, HOME.substitute())
+        else:
+            self.send(404, "")
+
+    def send(self, status: int, body: str) -> None:
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int = 0, pages: int = PAGES) -> ThreadingHTTPServer:
+    # Runs in a background thread, the search URL is stub_url(server)
+    handler = type("Handler", (StubHandler,), {"pages": pages})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def stub_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/search"
+
+
+def location_state(zip_: str) -> dict:
+    # What set_location saves after choosing the ZIP in the widget
+    return {
+        "cookies": [{"name": "zip", "value": zip_, "domain": "127.0.0.1", "path": "/"}],
+        "local_storage": {"location": zip_},
+    }
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else PAGES
+
+    server = serve(port, pages)
+    print(f"Serving {stub_url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,15 @@
+import sys
+
+
+def peak_rss_mb() -> float:
+    # Peak resident memory of this process so far
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 1024**2
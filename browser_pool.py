@@ -0,0 +1,220 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import contextlib
+
+import psutil
+import diskcache
+
+MAX_BROWSERS = 8
+MAX_PAGES = 500  # page loads before a browser is restarted
+MAX_MEMORY_MB = 1500  # memory of a browser and its renderers before a restart
+LEASE_TTL = 600  # frees the browsers of a crashed scrape, renewed on every page
+POOL_DIR = "./browsers"
+
+
+class BrowserPool:
+    # Long-lived Chrome instances that are borrowed through their DevTools port.
+    # The state is kept in a diskcache, so the app, its long callback processes
+    # and the CLI all reuse the same warm, location-primed browsers. It has its
+    # own directory without eviction, the page cache must not push out a lease
+
+    def __init__(
+        self,
+        directory=POOL_DIR,
+        name="pool",
+        headless=True,
+        max_pages=MAX_PAGES,
+        max_memory_mb=MAX_MEMORY_MB,
+    ):
+        self.cache = diskcache.Cache(directory, eviction_policy="none")
+        self.name = name
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.slots = {}  # id(driver) -> slot of the browsers borrowed here
+        self.pages = {}  # slot -> pages loaded since it was borrowed
+        self.lock = threading.Lock()
+
+    def _key(self, n: int) -> tuple:
+        return ("browser", self.name, n)
+
+    def _lease_key(self, n: int) -> tuple:
+        return ("browser-lease", self.name, n)
+
+    def _lease(self, zip_: str) -> int:
+        # Prefers a browser already set to the ZIP, then any running one
+        while True:
+            states = {n: self.cache.get(self._key(n)) for n in range(MAX_BROWSERS)}
+            for n in sorted(
+                states,
+                key=lambda n: (states[n] is None, (states[n] or {}).get("zip") != zip_),
+            ):
+                if self.cache.add(self._lease_key(n), os.getpid(), expire=LEASE_TTL):
+                    return n
+
+            time.sleep(0.5)
+
+    def _is_running(self, state) -> bool:
+        try:
+            return psutil.Process(state["pid"]).create_time() == state["created"]
+        except (psutil.NoSuchProcess, TypeError):
+            return False
+
+    def _processes(self, state) -> list:
+        try:
+            process = psutil.Process(state["pid"])
+            return [process] + process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def memory_mb(self, state) -> float:
+        total = 0
+        for process in self._processes(state):
+            with contextlib.suppress(psutil.NoSuchProcess):
+                total += process.memory_info().rss
+
+        return total / 1024**2
+
+    def _launch(self, chrome_binary_location, n: int) -> dict:
+        from selenium_init import launch_chrome, free_port
+
+        port = free_port()
+        profile = os.path.join("Chrome", f"{self.name}-{n}")
+        pid = launch_chrome(chrome_binary_location, self.headless, profile, port)
+
+        state = {
+            "pid": pid,
+            "created": psutil.Process(pid).create_time(),
+            "port": port,
+            "zip": None,
+            "pages": 0,
+        }
+        self.cache.set(self._key(n), state)
+
+        return state
+
+    def _stop(self, n: int) -> None:
+        state = self.cache.pop(self._key(n))
+        if state is None or not self._is_running(state):
+            return
+
+        processes = self._processes(state)
+        for process in processes:
+            with contextlib.suppress(psutil.NoSuchProcess):
+                process.terminate()
+        _, alive = psutil.wait_procs(processes, timeout=10)
+        for process in alive:
+            with contextlib.suppress(psutil.NoSuchProcess):
+                process.kill()
+
+    def _attach(self, chrome_binary_location, n: int):
+        from selenium.common.exceptions import WebDriverException
+        from selenium_init import attach_driver
+
+        state = self.cache.get(self._key(n))
+        if state is None or not self._is_running(state):
+            self._stop(n)
+            state = self._launch(chrome_binary_location, n)
+
+        # Health check, a hanging or crashed browser is replaced
+        try:
+            driver = attach_driver(state["port"])
+            driver.current_url
+        except WebDriverException as e:
+            print(e)
+            self._stop(n)
+            state = self._launch(chrome_binary_location, n)
+            driver = attach_driver(state["port"])
+
+        return driver, state
+
+    @contextlib.contextmanager
+    def driver(self, chrome_binary_location, url: str, zip_: str, first_item: str):
+        # Yields a driver with the location set, None if it couldn't be set
+        from selenium.common.exceptions import WebDriverException
+        from marktguru_scraper import set_location
+
+        n = self._lease(zip_)
+        driver = None
+        try:
+            driver, state = self._attach(chrome_binary_location, n)
+
+            if state["zip"] != zip_:
+                state["zip"] = (
+                    zip_ if set_location(driver, first_item, zip_, url) else None
+                )
+                self.cache.set(self._key(n), state)
+
+            with self.lock:
+                self.slots[id(driver)] = n
+                self.pages[n] = 0
+
+            yield driver if state["zip"] == zip_ else None
+        finally:
+            if driver is not None:
+                with self.lock:
+                    self.slots.pop(id(driver), None)
+                    pages = self.pages.pop(n, 0)
+
+                with contextlib.suppress(WebDriverException):
+                    driver.quit()
+
+                self._release(n, pages)
+
+            self.cache.delete(self._lease_key(n))
+
+    def _release(self, n: int, pages: int) -> None:
+        state = self.cache.get(self._key(n))
+        if state is None:
+            return
+
+        state["pages"] += pages
+        if (
+            state["pages"] >= self.max_pages
+            or self.memory_mb(state) >= self.max_memory_mb
+        ):
+            # Recycled, the next lease starts a fresh browser with the same profile
+            self._stop(n)
+        else:
+            self.cache.set(self._key(n), state)
+
+    def counted(self, fetch):
+        # Wraps a fetch function to count the page loads of the borrowed browsers
+        def fetch_page(driver, *args, **kwargs):
+            with self.lock:
+                n = self.slots.get(id(driver))
+                if n is not None:
+                    self.pages[n] += 1
+
+            if n is not None:
+                self.cache.touch(self._lease_key(n), expire=LEASE_TTL)
+
+            return fetch(driver, *args, **kwargs)
+
+        return fetch_page
+
+    def close(self) -> None:
+        # Stops the idle browsers, the ones still borrowed by a scrape are left
+        for n in range(MAX_BROWSERS):
+            if self.cache.add(self._lease_key(n), os.getpid(), expire=LEASE_TTL):
+                self._stop(n)
+                self.cache.delete(self._lease_key(n))
+
+
+@contextlib.contextmanager
+def temporary_pool(name: str, pool=None):
+    # The given pool, or one whose browsers only live as long as the scrape
+    if pool is not None:
+        yield pool
+        return
+
+    pool = BrowserPool(tempfile.mkdtemp(), name)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.cache.close()
+        shutil.rmtree(pool.cache.directory, ignore_errors=True)
@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+
+CHECKPOINT_DIR = "checkpoints"
+
+
+class Journal:
+    # Append-only log of the finished pages and items of one scrape. Only
+    # where each page is in the file is kept in memory, the records are read
+    # back when a run is resumed
+
+    def __init__(self, url: str, zip_: str, shopping_list: list):
+        key = hashlib.sha1(
+            json.dumps([url, zip_, shopping_list]).encode("utf-8")
+        ).hexdigest()[:12]
+
+        self.path = os.path.join(CHECKPOINT_DIR, f"{key}.jsonl")
+        self.lock = threading.Lock()
+        self.items = self._load()
+
+    def _load(self) -> dict:
+        items = {}
+        end = 0  # the end of the last complete line
+
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # the last line was cut off by a crash
+                    end += len(line)
+
+                    try:
+                        entry = json.loads(line.decode("utf-8"))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        continue
+
+                    item = items.setdefault(entry["item"], {"pages": {}, "done": False})
+                    if entry.get("done", False):
+                        item["done"] = True
+                    else:
+                        item["pages"][entry["page"]] = end - len(line)
+
+            # The next entry would be glued to the cut off line otherwise
+            if os.path.getsize(self.path) > end:
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)
+        except FileNotFoundError:
+            pass
+
+        return items
+
+    def _append(self, entry: dict) -> int:
+        # Returns where the entry starts in the file
+        with self.lock:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write((json.dumps(entry) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+        return offset
+
+    def _read(self, offset: int) -> list:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline().decode("utf-8"))["records"]
+
+    def add_page(self, item: str, page: int, records: list) -> None:
+        offset = self._append({"item": item, "page": page, "records": records})
+        self.items.setdefault(item, {"pages": {}, "done": False})["pages"][
+            page
+        ] = offset
+
+    def finish_item(self, item: str) -> None:
+        self._append({"item": item, "done": True})
+        self.items.setdefault(item, {"pages": {}, "done": False})["done"] = True
+
+    def is_done(self, item: str) -> bool:
+        return self.items.get(item, {}).get("done", False)
+
+    def pages(self, item: str) -> list:
+        # The finished pages in a row from the first one
+        pages = self.items.get(item, {}).get("pages", {})
+
+        finished = []
+        while len(finished) in pages:
+            finished.append(self._read(pages[len(finished)]))
+
+        return finished
+
+    def records(self, item: str) -> list:
+        return [r for page in self.pages(item) for r in page]
+
+    def clear(self) -> None:
+        with self.lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self.items = {}
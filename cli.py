@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+import diskcache
+from selenium.common.exceptions import WebDriverException
+
+from helpers import read_list
+from browser_pool import BrowserPool
+from marktguru_scraper import generate_output, load_location_state
+from scraper_pool import iter_scraper_pool
+from multi_zip import parse_zips, iter_scraper_zips
+from offer_stream import OfferStream
+from matcher import get_matcher
+from page_cache import SIZE_LIMIT
+from checkpoint import Journal
+from history import HISTORY_DB
+from retry import RetryPolicy
+from metrics import METRICS, log_to_file
+
+
+# Exit codes, 2 is also used by argparse for invalid arguments
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CONFIG = 2
+EXIT_LOCATION = 3
+EXIT_NO_OFFERS = 4
+EXIT_PARTIAL = 5  # the report misses items, the browsers stopped
+
+DEFAULTS = {
+    "url": "https://www.marktguru.de/search",
+    "chrome": "",
+    "shopping_list": "shopping_list.txt",
+    "item_blacklist": "item_blacklist.txt",
+    "zip": "10713",
+    "lp": "Item",
+    "compare": "unit",
+    "moe": 0,
+    "workers": 1,
+    "engine": "selenium",
+    "output": None,
+    "resume": False,
+    "no_cache": False,
+    "no_history": False,
+    "keep_browsers": False,
+}
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Scrapes the marktguru offers of a shopping list without the UI."
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        help="JSON file with any of the options below, the arguments take precedence",
+    )
+    parser.add_argument("--url", help="search URL")
+    parser.add_argument("--chrome", help="path to the Chrome executable")
+    parser.add_argument("-s", "--shopping-list", help="file with one item per line")
+    parser.add_argument(
+        "-b", "--item-blacklist", help="file with one product name per line to skip"
+    )
+    parser.add_argument("-z", "--zip", help="ZIP code, or several separated by commas")
+    parser.add_argument(
+        "--lp", choices=["Item", "Name"], help="display lowest price by item or name"
+    )
+    parser.add_argument(
+        "--compare",
+        choices=["unit", "pack"],
+        help="lowest price per kg, l or piece where known, or per pack",
+    )
+    parser.add_argument(
+        "--moe", type=int, help="empty results to skip in case of errors on a page"
+    )
+    parser.add_argument("-w", "--workers", type=int, help="browsers in parallel")
+    parser.add_argument("-e", "--engine", choices=["selenium", "http", "async"])
+    parser.add_argument("-o", "--output", help="where to write the report")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=None,
+        help="resume the last interrupted run",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=None,
+        help="don't reuse the cached pages",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        default=None,
+        help="don't add the offers to the price history",
+    )
+    parser.add_argument(
+        "--keep-browsers",
+        action="store_true",
+        default=None,
+        help="keep the browsers running for the next run (also shared with the app)",
+    )
+
+    return parser
+
+
+def get_options(argv=None) -> dict:
+    args = vars(get_parser().parse_args(argv))
+
+    # Defaults < config file < command line
+    options = dict(DEFAULTS)
+    config = args.pop("config")
+    if config is not None:
+        with open(config, "r", encoding="utf-8") as f:
+            options.update({k.replace("-", "_"): v for k, v in json.load(f).items()})
+
+    options.update({k: v for k, v in args.items() if v is not None})
+
+    return options
+
+
+def read_list_file(file: str) -> list:
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            return read_list(f.read())
+    except FileNotFoundError:
+        return []
+
+
+def needs_browser(engine: str, zip_: str) -> bool:
+    # The HTTP engines only need a browser to set a location not saved yet
+    return engine == "selenium" or load_location_state(zip_) is None
+
+
+def run(options: dict) -> int:
+    sl = read_list_file(options["shopping_list"])
+    ib = read_list_file(options["item_blacklist"])
+    zips = parse_zips(str(options["zip"]))
+    workers = int(options["workers"])
+
+    if len(sl) == 0:
+        print("Shopping list is empty")
+        return EXIT_CONFIG
+    if len(zips) == 0:
+        print("ZIP code is empty")
+        return EXIT_CONFIG
+
+    browser = any(needs_browser(options["engine"], z) for z in zips)
+    if browser and not os.path.exists(options["chrome"]):
+        print(f"Chrome not found: '{options['chrome']}'")
+        return EXIT_CONFIG
+
+    log_to_file()
+
+    # The app's cache and browsers, so the app and the CLI share them
+    cache = diskcache.Cache("./cache", size_limit=SIZE_LIMIT)
+    pool = BrowserPool()
+
+    try:
+        return scrape(options, sl, ib, zips, workers, cache, pool)
+    finally:
+        if not options["keep_browsers"]:
+            pool.close()
+
+
+def scrape(options, sl, ib, zips, workers, cache, pool) -> int:
+    journals = {z: Journal(options["url"], z, sl) for z in zips}
+    if not options["resume"]:
+        for journal in journals.values():
+            journal.clear()
+
+    data = OfferStream(get_matcher(ib, cache))
+    pages = None if options["no_cache"] else cache
+    policy = RetryPolicy()
+    start = time.perf_counter()
+
+    if len(zips) == 1:
+        browser = needs_browser(options["engine"], zips[0])
+        if browser:
+            context = pool.driver(options["chrome"], options["url"], zips[0], sl[0])
+        else:
+            context = contextlib.nullcontext(None)
+
+        with context as driver:
+            if browser and driver is None:
+                print(f"Couldn't set the location {zips[0]}")
+                return EXIT_LOCATION
+
+            for index, _, page, page_results in iter_scraper_pool(
+                driver,
+                options["chrome"],
+                options["url"],
+                options["moe"],
+                sl,
+                zips[0],
+                workers,
+                options["engine"],
+                pages,
+                journals[zips[0]],
+                pool,
+                policy,
+            ):
+                data.add(page_results, (index, page))
+    else:
+        for _, index, _, page, page_results in iter_scraper_zips(
+            options["chrome"],
+            options["url"],
+            options["moe"],
+            sl,
+            zips,
+            workers,
+            options["engine"],
+            pages,
+            journals,
+            pool,
+            policy,
+        ):
+            data.add(page_results, (index, page))
+
+    print(f"Pages: {policy.summary()}")
+    METRICS.event(
+        "run", zips=zips, offers=len(data), seconds=time.perf_counter() - start
+    )
+    METRICS.publish(cache, force=True)
+
+    if len(data) == 0:
+        print("No offers found")
+        return EXIT_NO_OFFERS
+
+    history_db = None if options["no_history"] else HISTORY_DB
+    file = generate_output(
+        data, options["lp"], ib, zips[0], history_db, options["compare"]
+    )
+    if options["output"] is not None:
+        os.replace(file, options["output"])
+        file = options["output"]
+
+    print(f"{len(data)} offers written to {file}")
+
+    if len(policy.unscraped) > 0:
+        # The journals are kept, --resume scrapes the missing items
+        print("Not scraped: " + ", ".join(f"{i} ({z})" for z, i in policy.unscraped))
+        return EXIT_PARTIAL
+
+    for journal in journals.values():
+        journal.clear()
+
+    return EXIT_OK
+
+
+def main(argv=None) -> int:
+    try:
+        options = get_options(argv)
+    except (OSError, ValueError) as e:
+        print(f"Invalid config: {e}")
+        return EXIT_CONFIG
+
+    try:
+        return run(options)
+    except (WebDriverException, RuntimeError) as e:
+        print(e)
+        return EXIT_ERROR
+    except KeyboardInterrupt:
+        # The journal is kept, --resume picks up from here
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
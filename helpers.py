@@ -1,5 +1,6 @@
 from os import path
-import dash_bootstrap_components as dbc
+
+from matcher import REGEX
 
 
 def check_chrome_exe_path(p: str) -> bool:
@@ -31,13 +32,16 @@ def write_txt_file(file: str, txt: str) -> None:
 
 def read_list(input: str) -> list:
     return [
-        line.rstrip().lower()
+        line.rstrip() if line.startswith(REGEX) else line.rstrip().lower()
         for line in input.splitlines()
         if not line.startswith("#") and not line.rstrip() == ""
-    ]  # strips spaces and new lines
+    ]  # strips spaces and new lines, regular expressions keep their case
 
 
 def get_alert(c, color):
+    # Only the UI needs dbc, the CLI doesn't pay for importing it
+    import dash_bootstrap_components as dbc
+
     return (
         dbc.Alert(
             c,
@@ -0,0 +1,142 @@
+import sqlite3
+import contextlib
+from datetime import date
+
+import pandas as pd
+
+
+HISTORY_DB = "history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    run_date TEXT NOT NULL,
+    zip TEXT NOT NULL,
+    store TEXT NOT NULL,
+    item TEXT NOT NULL,
+    name TEXT NOT NULL,
+    brand TEXT,
+    price REAL,
+    unit TEXT,
+    date_valid TEXT,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS offers_item_store_date ON offers (item, store, run_date);
+CREATE INDEX IF NOT EXISTS offers_name_date ON offers (name, run_date);
+CREATE INDEX IF NOT EXISTS offers_item_date_price ON offers (item, run_date, price);
+CREATE INDEX IF NOT EXISTS offers_date_zip ON offers (run_date, zip);
+"""
+
+COLUMNS = {
+    "Store": "store",
+    "Item": "item",
+    "Name": "name",
+    "Brand": "brand",
+    "Price": "price",
+    "Unit": "unit",
+    "Date valid": "date_valid",
+    "Note": "note",
+}
+
+
+@contextlib.contextmanager
+def connect(path: str = HISTORY_DB):
+    con = sqlite3.connect(path)
+    try:
+        con.executescript(SCHEMA)
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def append_run(df: pd.DataFrame, zip_: str, run_date: date = None, path=HISTORY_DB):
+    # Keeps one snapshot per day and ZIP, a rerun on the same day replaces it.
+    # A ZIP column (several locations in one run) takes precedence over zip_
+    run_date = (run_date or date.today()).isoformat()
+
+    rows = df.reindex(columns=list(COLUMNS)).rename(columns=COLUMNS)
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows.insert(0, "zip", df["ZIP"] if "ZIP" in df.columns else zip_)
+    rows.insert(0, "run_date", run_date)
+
+    with connect(path) as con:
+        con.executemany(
+            "DELETE FROM offers WHERE run_date = ? AND zip = ?",
+            [(run_date, z) for z in rows["zip"].unique()],
+        )
+        con.executemany(
+            f"INSERT INTO offers ({', '.join(rows.columns)}) "
+            f"VALUES ({', '.join('?' * len(rows.columns))})",
+            rows.itertuples(index=False, name=None),
+        )
+
+
+def _query(sql: str, params: list, path: str) -> pd.DataFrame:
+    with connect(path) as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+
+def _filters(*conditions):
+    # Builds the WHERE clause from the (column, operator, value) that are set
+    clauses, params = [], []
+    for column, op, value in conditions:
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(str(value))
+
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def cheapest_per_item(
+    item=None, zip_=None, start=None, end=None, path=HISTORY_DB
+) -> pd.DataFrame:
+    # The cheapest offer of every item on every run date
+    where, params = _filters(
+        ("item", "=", item),
+        ("zip", "=", zip_),
+        ("run_date", ">=", start),
+        ("run_date", "<=", end),
+    )
+
+    # SQLite fills the bare columns from the row with the MIN price
+    return _query(
+        "SELECT run_date, item, MIN(price) AS price, store, name, brand, unit, zip "
+        f"FROM offers{where} GROUP BY run_date, item ORDER BY item, run_date",
+        params,
+        path,
+    )
+
+
+def price_trend(
+    item, store=None, name=None, zip_=None, path=HISTORY_DB
+) -> pd.DataFrame:
+    # Minimum, average and maximum price of an item per run date
+    where, params = _filters(
+        ("item", "=", item),
+        ("store", "=", store),
+        ("name", "=", name),
+        ("zip", "=", zip_),
+    )
+
+    return _query(
+        "SELECT run_date, MIN(price) AS min_price, AVG(price) AS avg_price, "
+        "MAX(price) AS max_price, COUNT(*) AS offers "
+        f"FROM offers{where} GROUP BY run_date ORDER BY run_date",
+        params,
+        path,
+    )
+
+
+def first_seen(item=None, store=None, name=None, path=HISTORY_DB) -> pd.DataFrame:
+    # When each product was first and last seen at each store
+    where, params = _filters(
+        ("item", "=", item), ("store", "=", store), ("name", "=", name)
+    )
+
+    return _query(
+        "SELECT name, store, item, MIN(run_date) AS first_seen, "
+        "MAX(run_date) AS last_seen, COUNT(DISTINCT run_date) AS runs "
+        f"FROM offers{where} GROUP BY name, store ORDER BY first_seen, name",
+        params,
+        path,
+    )
@@ -0,0 +1,81 @@
+import re
+import html
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from marktguru_scraper import load_location_state, parse_page
+from retry import LocationDriftError
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
+)
+
+TAG = re.compile(r"<[^>]*>")
+
+
+def _by_class(name: str) -> re.Pattern:
+    # The first element with the class and its content, like find(class_=...)
+    return re.compile(
+        r"<(\w+)[^>]*\sclass=[\"'][^\"']*(?<![\w-])"
+        + name
+        + r"(?![\w-])[^\"']*[\"'][^>]*>(.*?)</\1\s*>",
+        re.S,
+    )
+
+
+# Only the headline and the location are needed for the checks, a full parse
+# of the page would take longer than the one of the offers
+HEADLINE = _by_class("headline")
+LOCATION = _by_class("location-text")
+
+
+def _text(pattern: re.Pattern, page: str):
+    m = pattern.search(page)
+    return None if m is None else html.unescape(TAG.sub("", m.group(2)))
+
+
+def get_session(zip_: str, pool_size: int = 10) -> requests.Session:
+    session = requests.Session()
+
+    # Keeps the connections alive and shares them between threads
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    session.headers.update({"User-Agent": USER_AGENT})
+
+    # Attaches the location saved by set_location
+    state = load_location_state(zip_)
+    if state is not None:
+        for cookie in state["cookies"]:
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+    return session
+
+
+def fetch_page(session, url: str, item: str, page: int, zip_: str) -> str:
+    r = session.get(f"{url}/{item}?title={item}&page={page}", timeout=30)
+    r.raise_for_status()
+
+    # Exit condition: last page found, continues with the next item
+    headline = _text(HEADLINE, r.text)
+    assert headline is not None and item.upper() in headline.upper()
+
+    # Without the location in the HTML the page can't be checked
+    location = _text(LOCATION, r.text)
+    if location is not None and zip_ not in location:
+        raise LocationDriftError(f"Location error! The page isn't for {zip_}.")
+
+    return r.text
+
+
+def search_page(session, url: str, item: str, page: int, zip_: str) -> list:
+    return parse_page(fetch_page(session, url, item, page, zip_), item)
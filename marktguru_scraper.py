@@ -1,49 +1,169 @@
+import os
+import re
+import json
 import time
 import warnings
+from urllib.parse import urljoin
 
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
-from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
 from datetime import date
 
+from parsers import get_parser
+from offer_stream import OfferStream
+from report import write_report
+from unit_price import unit_prices
+from retry import RetryPolicy, EmptyResultsError, LocationDriftError, PageSkipped
+import history
+import page_cache
+from metrics import METRICS
+
+
+URL = "https://www.marktguru.de/search"
+LOCATION_STATE_DIR = "locations"
+# Only the suggestion list, any visible link would end the wait too early
+LOCATION_SUGGESTION = (By.CSS_SELECTOR, "[role='option'], .pac-item")
+PAGE_LINK = re.compile(r"[?&](?:amp;)?page=(\d+)")
+
+# Offer cards are the list items with a product name, see parsers
+CARD_COUNT = "return [document.readyState, document.querySelectorAll('li h3').length]"
+CARD_POLL = 0.25
+CARD_TIMEOUT = 30
+
+# The report columns, before the optional Note
+COLUMNS = [
+    "Store",
+    "Item",
+    "Name",
+    "Brand",
+    "Price",
+    "Unit",
+    "Unit price",
+    "Base unit",
+    "Date valid",
+]
+
+
+def _location_state_file(zip_: str) -> str:
+    return os.path.join(LOCATION_STATE_DIR, f"{zip_}.json")
+
+
+def save_location_state(driver, zip_: str) -> None:
+    # Cookies and localStorage are all the site needs to remember the location
+    state = {
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script(
+            "return Object.assign({}, window.localStorage);"
+        ),
+    }
+
+    os.makedirs(LOCATION_STATE_DIR, exist_ok=True)
+    with open(_location_state_file(zip_), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def load_location_state(zip_: str):
+    try:
+        with open(_location_state_file(zip_), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
 
-def set_location(driver, first_item: str, zip: str):
+def _location_is_set(driver, zip_: str, timeout: int) -> bool:
     try:
-        driver.get(
-            f"https://www.marktguru.de/search/{first_item}?title={first_item}&page=0"
+        WebDriverWait(driver, timeout).until(
+            EC.text_to_be_present_in_element((By.CLASS_NAME, "location-text"), zip_)
         )
+        return True
+    except TimeoutException:
+        return False
+
+
+def restore_location(driver, first_item: str, zip_: str, url: str = URL) -> bool:
+    state = load_location_state(zip_)
+    if state is None:
+        return False
+
+    # Cookies can only be added for the domain that is currently open
+    driver.get(urljoin(url, "/"))
+    driver.delete_all_cookies()
+    for cookie in state["cookies"]:
+        cookie = {
+            k: v
+            for k, v in cookie.items()
+            if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry")
+        }
+        if "expiry" in cookie:
+            cookie["expiry"] = int(cookie["expiry"])
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException:
+            pass
+    driver.execute_script(
+        "for (const [k, v] of Object.entries(arguments[0])) {"
+        " window.localStorage.setItem(k, v); }",
+        state["local_storage"],
+    )
+
+    driver.get(f"{url}/{first_item}?title={first_item}&page=0")
+
+    return _location_is_set(driver, zip_, 15)
+
+
+def set_location(driver, first_item: str, zip: str, url: str = URL):
+    # Skips the whole setup if the location was already saved for this ZIP
+    if restore_location(driver, first_item, zip, url):
+        return True
+
+    try:
+        driver.get(f"{url}/{first_item}?title={first_item}&page=0")
+
+        wait = WebDriverWait(driver, 30)
 
-        time.sleep(15)  # Waits for the page to load
+        # Waits for the location widget instead of a fixed delay
+        wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "location-default-text")))
 
         # Tries to remove view-locking elements
-        e = driver.find_element(By.ID, "usercentrics-root")
-        driver.execute_script("arguments[0].remove();", e)
+        for e in driver.find_elements(By.ID, "usercentrics-root"):
+            driver.execute_script("arguments[0].remove();", e)
 
         # Opens location input
         driver.find_element(By.CLASS_NAME, "location-default-text").click()
 
-        time.sleep(5)
-
         # Selects the location input and enters the ZIP code
+        wait.until(lambda d: len(d.find_elements(By.TAG_NAME, "input")) > 1)
         inputs = driver.find_elements(By.TAG_NAME, "input")
+        # Selenium 3 only takes locators in element_to_be_clickable
+        wait.until(lambda d: inputs[1].is_displayed() and inputs[1].is_enabled())
         inputs[1].send_keys(zip + Keys.ENTER)
 
-        time.sleep(5)
+        # Waits for the address suggestions to show up
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.visibility_of_element_located(LOCATION_SUGGESTION)
+            )
+        except TimeoutException:
+            pass
 
         # Selects the first address
         driver.switch_to.active_element.send_keys(Keys.ARROW_DOWN)
-        time.sleep(2)
         driver.switch_to.active_element.send_keys(Keys.ENTER)
 
-        time.sleep(5)
+        # The location is set once the header shows the ZIP code
+        if not _location_is_set(driver, zip, 30):
+            raise TimeoutException(f"Location {zip} was not applied")
+
+        save_location_state(driver, zip)
 
         return True
-    except Exception as e:
+    except WebDriverException as e:
         print()
         print(e)
         print()
@@ -53,14 +173,29 @@ def set_location(driver, first_item: str, zip: str):
         return False
 
 
-def search_page(driver, url: str, item: str, page: int, zip_: str) -> list:
-    results = []
+def wait_for_cards(driver, timeout: int = CARD_TIMEOUT) -> int:
+    # The page is ready once it has loaded and the number of offer cards
+    # stopped changing between two polls. Returns the number of cards
+    last = None
 
-    driver.get(f"{url}/{item}?title={item}&page={page}")
+    def ready(d):
+        nonlocal last
+        state, count = d.execute_script(CARD_COUNT)
+        stable = state == "complete" and count > 0 and count == last
+        last = count
+
+        return count if stable else False
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=CARD_POLL).until(ready)
+    except TimeoutException:
+        # A page without any offers
+        return last or 0
 
-    driver.get(driver.current_url)
 
-    driver.implicitly_wait(10)
+def fetch_page(driver, url: str, item: str, page: int, zip_: str) -> str:
+    start = time.perf_counter()
+    driver.get(f"{url}/{item}?title={item}&page={page}")
 
     # Exit condition: last page found, continues with the next item
     WebDriverWait(driver, 10).until(
@@ -69,180 +204,378 @@ def search_page(driver, url: str, item: str, page: int, zip_: str) -> list:
     assert item.upper() in driver.find_element(By.CLASS_NAME, "headline").text
 
     # Waits until the Item cards are loaded - affects the results
-    WebDriverWait(driver, 120).until(
-        EC.visibility_of_all_elements_located((By.TAG_NAME, "li"))
-    )
+    wait_start = time.perf_counter()
+    cards = wait_for_cards(driver)
+    wait = METRICS.stage("wait", wait_start)
+    METRICS.event("wait", item=item, page=page, zip=zip_, cards=cards, wait_s=wait)
+    print(f"     {cards} offers ready after {time.perf_counter() - start:.2f} s")
 
     if zip_ not in driver.find_element(By.CLASS_NAME, "location-text").text:
-        print()
-        print("Location error!")
-        print()
+        # Puts the saved location back for the next attempt
+        restore_location(driver, item, zip_, url)
+        raise LocationDriftError(f"Location error! The page isn't for {zip_}.")
 
-    # Parses the page
-    bs = BeautifulSoup(driver.page_source, "html.parser")
+    return driver.page_source
 
-    for li in bs.select("li"):
 
-        h3 = li.select("h3")
+def parse_page(html: str, item: str, parser: str = None) -> list:
+    return get_parser(parser).parse(html, item)
 
-        i = {}
 
-        if len(h3) > 0:
-            i["Item"] = item
+def parse_page_count(html: str):
+    # Reads the number of pages from the pagination links, None if there are none
+    pages = [int(p) for p in PAGE_LINK.findall(html)]
+    if len(pages) == 0:
+        return None
 
-            i["Name"] = "".join([x.text for x in h3]).rstrip().lower()
+    return max(pages) + 1
 
-            dd = li.select("dl > dt.dates + dd")
-            i["Date valid"] = "".join([x.text for x in dd]).rstrip().lower()
 
-            a = li.select("dl > dt.retailer + dd > a")
-            if len(list(a)) == 0:
-                span = li.select("dl > dt.retailer + dd > span")
-                i["Store"] = "".join([x.text for x in span]).rstrip().lower()
-            else:
-                i["Store"] = "".join([x.text for x in a]).rstrip().lower()
+def count_empty_results(page_results: list) -> int:
+    return sum(
+        1
+        for result in page_results
+        if result["Name"] == "" or result["Price"] == "" or result["Store"] == ""
+    )
 
-            brand_a = li.select("dl > dt.brand + dd > a")
-            if len(list(brand_a)) == 0:
-                brand_span = li.select("dl > dt.brand + dd > span")
-                i["Brand"] = "".join([x.text for x in brand_span]).rstrip().lower()
-            else:
-                i["Brand"] = "".join([x.text for x in brand_a]).rstrip().lower()
 
-            price_strong = li.select("p > strong")
-            if len(list(price_strong)) == 0:
-                price_dd = li.select("dl > div.prices-container> dt.price + dd")
-                price_p = li.select("p")
+def search_page(driver, url: str, item: str, page: int, zip_: str) -> list:
+    return parse_page(fetch_page(driver, url, item, page, zip_), item)
 
-                i["Price"] = "".join([x.text for x in price_dd]).rstrip().lower()
-                i["Note"] = "".join([x.text for x in price_p]).rstrip().lower()
-            else:
-                i["Price"] = (
-                    "".join([x.text for x in price_strong])
-                    .split("-")[0]
-                    .rstrip()
-                    .lower()
-                )
 
-            # print(i)
+def get_page(
+    driver, url, item, page, zip_, fetch=fetch_page, cache=None, refresh=False
+):
+    # Returns the page HTML, records and whether they came from the cache
+    if cache is not None and not refresh:
+        cached = page_cache.get_page(cache, url, zip_, item, page)
+        if cached is not None:
+            assert not cached.get("last", False)
+            METRICS.inc("cached_pages")
+            return cached["html"], cached["records"], True
 
-            results.append(i)
-        else:
-            continue
+    start = time.perf_counter()
+    try:
+        html = fetch(driver, url, item, page, zip_)
+    except AssertionError:
+        if cache is not None:
+            page_cache.set_last_page(cache, url, zip_, item, page)
+        raise
+    fetch_s = METRICS.stage("fetch", start)
+
+    start = time.perf_counter()
+    page_results = parse_page(html, item)
+    parse_s = METRICS.stage("parse", start)
+
+    empty = count_empty_results(page_results)
+    METRICS.inc("fetched_pages")
+    METRICS.inc("records", len(page_results))
+    METRICS.inc("empty_records", empty)
+    METRICS.event(
+        "page",
+        item=item,
+        page=page,
+        zip=zip_,
+        fetch_s=fetch_s,
+        parse_s=parse_s,
+        records=len(page_results),
+        empty=empty,
+    )
 
-    return results
+    return html, page_results, False
 
 
-def launch_scraper(driver, url, moe, shopping_list, zip_):
+def get_valid_page(driver, url, moe, item, page, zip_, fetch, cache, refresh, policy):
+    # Retries the page as the policy allows, raises AssertionError past the
+    # last page and PageSkipped once the policy gives up on it
+    attempt = 0
+    while True:
+        policy.check(item, zip_)
+        try:
+            html, page_results, cached = get_page(
+                driver, url, item, page, zip_, fetch, cache, refresh
+            )
+            if count_empty_results(page_results) > moe:
+                raise EmptyResultsError(
+                    f"Got more than {moe} empty result(s)."
+                )  # see the config file
+
+            policy.on_success(item, zip_)
+            return html, page_results, cached
+        except Exception as e:
+            delay = policy.on_error(e, item, attempt, zip_)
+            print("    ", f"{e} Retrying in {delay:.1f} s...")
+            time.sleep(delay)
+            attempt += 1
+
+
+def iter_item(
+    driver,
+    url,
+    moe,
+    item,
+    zip_,
+    fetch=fetch_page,
+    cache=None,
+    journal=None,
+    policy=None,
+):
+    # Yields (page, records) as soon as each page is validated
+    policy = policy or RetryPolicy()
     data = []
+    first_page = []
+    refresh = False
+
+    print()
+    print("  ", f"Searching for '{item}'")
+    print()
+
+    page = 0
+    if journal is not None:
+        # Continues after the last page finished by an interrupted run
+        pages = journal.pages(item)
+        for page, page_results in enumerate(pages):
+            yield page, page_results
+
+        if journal.is_done(item):
+            print("    ", "Restored from the checkpoint.")
+            return
+
+        for page_results in pages:
+            data.extend(page_results)
+        if len(pages) > 0:
+            first_page = pages[0]
+            page = len(pages)
+
+    while True:
+        print("   ", f"Page {page + 1}")
+        try:
+            html, page_results, cached = get_valid_page(
+                driver, url, moe, item, page, zip_, fetch, cache, refresh, policy
+            )
 
-    for item in shopping_list:
-        print()
-        print("  ", f"Searching for '{item}'")
-        print()
+            if cache is not None and not cached:
+                page_cache.set_page(cache, url, zip_, item, page, html, page_results)
+
+                if page == 0:
+                    # Reuses the last results if the first page didn't change
+                    snapshot = page_cache.get_item(cache, url, zip_, item)
+                    if snapshot is not None and snapshot[
+                        "fingerprint"
+                    ] == page_cache.fingerprint(page_results):
+                        print("    ", "No changes since the last run.")
+                        if journal is not None:
+                            journal.add_page(item, 0, snapshot["records"])
+                            journal.finish_item(item)
+                        yield 0, snapshot["records"]
+                        return
+
+                    # The offers changed - the cached pages after this one are outdated
+                    refresh = True
+
+            if page == 0:
+                first_page = page_results
+
+            if journal is not None:
+                journal.add_page(item, page, page_results)
+
+            data.extend(page_results)
+
+            yield page, page_results
+        except AssertionError:
+            print()
+            print("    ", "Reached the last page.")
+            break
+        except PageSkipped as e:
+            print("    ", f"Skipped page {page + 1}: {e}")
+            if policy.is_open(item, zip_):
+                print("    ", "Too many failed pages, skipping the rest of the item.")
+                # Not finished, a resumed or later run tries the item again
+                return
+
+        page += 1
+
+    if cache is not None:
+        page_cache.set_item(cache, url, zip_, item, first_page, data)
+    if journal is not None:
+        journal.finish_item(item)
+
+
+def get_engine(driver, zip_, engine="selenium"):
+    # Returns the object to fetch pages with and the matching fetch function
+    if engine == "http":
+        from http_engine import get_session, fetch_page as http_fetch_page
+
+        return get_session(zip_), http_fetch_page
+
+    return driver, fetch_page
+
+
+def iter_scraper(
+    driver,
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    engine="selenium",
+    cache=None,
+    journal=None,
+    policy=None,
+):
+    # Yields (item index, item, page, records) as the pages come in
+    policy = policy or RetryPolicy()
+    if engine == "async":
+        from async_pipeline import iter_scraper_async
+
+        yield from iter_scraper_async(
+            url, moe, shopping_list, zip_, cache=cache, journal=journal, policy=policy
+        )
+        return
+
+    driver, fetch = get_engine(driver, zip_, engine)
+
+    for index, item in enumerate(shopping_list):
+        for page, page_results in iter_item(
+            driver, url, moe, item, zip_, fetch, cache, journal, policy
+        ):
+            yield index, item, page, page_results
+
+
+def launch_scraper(
+    driver,
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    engine="selenium",
+    cache=None,
+    journal=None,
+    policy=None,
+):
+    return merge_pages(
+        iter_scraper(
+            driver, url, moe, shopping_list, zip_, engine, cache, journal, policy
+        )
+    )
 
-        page = 0
-        while True:
-            print("   ", f"Page {page + 1}")
-            try:
-                page_results = search_page(driver, url, item, page, zip_)
-                empty_results = 0
-                for result in page_results:
-                    if (
-                        result["Name"] == ""
-                        or result["Price"] == ""
-                        or result["Store"] == ""
-                    ):
-                        empty_results += 1
-                if empty_results > moe:
-                    raise ValueError(
-                        f"Got more than {moe} empty result(s). Retrying..."
-                    )  # see the config file
-
-                data.extend(page_results)
-            except ValueError as e:
-                print("    ", e)
-                page -= 1
-            except AssertionError:
-                print()
-                print("    ", "Reached the last page.")
-                break
-            except Exception as e:
-                print(e)
-
-            page += 1
-
-    return data
-
-
-def generate_output(data, lp, item_blacklist) -> str:
-    warnings.simplefilter(action="ignore", category=FutureWarning)
 
-    df = pd.DataFrame(data)
+def merge_pages(pages) -> list:
+    # Puts streamed pages back in shopping list and page order
+    results = {}
+    for index, _, page, page_results in pages:
+        results[(index, page)] = page_results
+
+    return [result for key in sorted(results) for result in results[key]]
+
+
+def parse_prices(price: pd.Series) -> pd.Series:
+    # "€ 2,58 " -> 2.58, NaN if the price can't be read
+    # Prices repeat a lot, so only the distinct strings are parsed
+    codes, uniques = pd.factorize(price)
+    parsed = pd.to_numeric(
+        pd.Series(uniques, dtype=object)
+        .str.extract(r"^\S*\s+(\S*)", expand=False)
+        .str.replace(",", ".", regex=False),
+        errors="coerce",
+    ).to_numpy(dtype=float)
+
+    return pd.Series(
+        np.where(codes >= 0, parsed[codes], np.nan), index=price.index
+    )
+
+
+def flag_lowest_prices(df: pd.DataFrame, lp: str, compare: str = "pack") -> pd.Series:
+    # With several locations every ZIP is compared on its own
+    by = [df[c] for c in (["ZIP", lp] if "ZIP" in df.columns else [lp])]
+    price = df["Price"]
+
+    if compare == "unit":
+        # Prices per kg, l or piece are only compared within their base unit,
+        # the offers without one by their pack price
+        price = df["Unit price"].fillna(df["Price"])
+        by.append(df["Base unit"].fillna(""))
+
+    lowest = price == price.groupby(by).transform("min")
 
-    # Removing empty rows because of possible scraping errors
-    df = df[(df["Name"] != "") & (df["Store"] != "") & (df["Price"] != "")]
-    # Removing duplicate entries because of possible scraping errors
-    df.drop_duplicates(subset=["Name", "Price", "Date valid"], keep=False, inplace=True)
+    return pd.Series(
+        np.where(lowest, "✅ " + df[lp].astype(str), ""), index=df.index
+    )
+
+
+def blank_repeated(df: pd.DataFrame) -> pd.DataFrame:
+    # Shows Store once per store and Item once per run of the same item,
+    # expects the frame to be sorted by (ZIP,) Store and Item
+    df = df.copy()
+
+    new_store = df["Store"] != df["Store"].shift()
+    if "ZIP" in df.columns:
+        new_store |= df["ZIP"] != df["ZIP"].shift()
+    new_item = new_store | (df["Item"] != df["Item"].shift())
+
+    df["Store"] = df["Store"].where(new_store, "")
+    df["Item"] = df["Item"].where(new_item, "")
+
+    return df
+
+
+def generate_output(
+    data, lp, item_blacklist, zip_="", history_db=None, compare="pack"
+) -> str:
+    warnings.simplefilter(action="ignore", category=FutureWarning)
+    start = time.perf_counter()
 
-    df = df[~df["Name"].isin(item_blacklist)]
+    # Raw records are cleaned the same way as a stream filled while scraping
+    if not isinstance(data, OfferStream):
+        stream = OfferStream(item_blacklist)
+        stream.add(data)
+        data = stream
+
+    df = data.to_frame()
+    METRICS.stage("output_frame", start)
 
     # Handles Price and Units
-    df[["Price", "Unit"]] = df["Price"].str.split("/", expand=True)
+    start = time.perf_counter()
+    price_unit = df["Price"].str.split("/", n=1, expand=True)
+    df["Price"] = parse_prices(price_unit[0])
+    df["Unit"] = price_unit.reindex(columns=[1])[1]
+    df = df.join(unit_prices(df))
+    METRICS.stage("output_prices", start)
 
-    def str_to_float(x: str) -> float:
-        try:
-            return float(x.split(" ")[1].replace(",", "."))
-        except ValueError:
-            return 999.9  # returns 999.9 if cannot process the price
+    # Offers of several locations carry the ZIP they were scraped for
+    by_zip = ["ZIP"] if "ZIP" in df.columns else []
 
-    df["Price"] = df["Price"].apply(lambda x: str_to_float(x))
+    start = time.perf_counter()
     df.sort_values(
-        ["Store", "Item", "Price"], ascending=True, inplace=True
+        by_zip + ["Store", "Item", "Price"], ascending=True, inplace=True
     )  # sorting the Price from lowest to highest
 
     # Reordering columns
     try:
-        df = df[
-            ["Store", "Item", "Name", "Brand", "Price", "Unit", "Date valid", "Note"]
-        ]
+        df = df[by_zip + COLUMNS + ["Note"]]
     except KeyError:
-        df = df[["Store", "Item", "Name", "Brand", "Price", "Unit", "Date valid"]]
+        df = df[by_zip + COLUMNS]
 
-    # Lastly: Lowest price indicator
-    df["LP"] = df.groupby([lp])["Price"].transform("min")
-    df["Lowest price across stores"] = df.apply(
-        lambda x: f"✅ {x[lp]}" if x["LP"] == x["Price"] else "", axis=1
-    )
-    df.drop(["LP"], axis=1, inplace=True)  # remove the temporary column
+    # Lastly: Lowest price indicator, by pack or unit price
+    df["Lowest price across stores"] = flag_lowest_prices(df, lp, compare)
+    df["Unit price"] = df["Unit price"].round(2)  # only compared unrounded
+    METRICS.stage("output_sort", start)
+
+    # Keeps the offers of every run for later price lookups
+    if history_db is not None:
+        start = time.perf_counter()
+        history.append_run(df, zip_, path=history_db)
+        METRICS.stage("output_history", start)
 
     # Handles the output
     # ------------------------------------------------------
     today = date.today()
 
-    gbo = df.groupby(["Store"])
-
-    # Creates an empty Excel file
-    blank_line = pd.DataFrame()
-    blank_line.to_excel(f"{today}.xlsx", index=False)
-
-    # Loads the file, sets up the Excel Writer
-    book = load_workbook(f"{today}.xlsx")
-    writer = pd.ExcelWriter(f"{today}.xlsx", engine="openpyxl")
-    writer.sheets.update({ws.title: ws for ws in book.worksheets})
-
-    # Writes result tables to the file
-    for e, (_, o) in enumerate(gbo):
-        o[["Store", "Item"]] = o[["Store", "Item"]].where(
-            o[["Store", "Item"]].apply(lambda x: x != x.shift()), ""
-        )
-        if e == 0:
-            o.to_excel(writer, index=False)
-        else:
-            o.to_excel(
-                writer, startrow=writer.sheets["Sheet1"].max_row + 1, index=False
-            )
+    start = time.perf_counter()
+    gbo = blank_repeated(df).groupby([df[c] for c in by_zip + ["Store"]])
 
-    writer.close()
+    # Writes one result table per store (and ZIP) to the file
+    file = write_report(f"{today}.xlsx", (o for _, o in gbo))
+    METRICS.stage("output_report", start)
+    METRICS.event("output", rows=len(df), file=file)
 
-    return f"{today}.xlsx"
+    return file
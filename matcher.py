@@ -0,0 +1,182 @@
+import re
+import hashlib
+
+
+# Rule prefixes of the blacklist, a line without one is an exact product name
+REGEX = "re:"  # re:^bio\b - a regular expression found anywhere in the name
+CONTAINS = "contains:"  # contains:rama - a part of the name
+WORDS = "words:"  # words:milch bio - all of the words, in any order
+GLOB = "glob:"  # glob:*butter* - the whole name, like file names
+
+TOKEN = re.compile(r"\w+")
+
+_matchers = {}  # the compiled matchers of this process by rules hash
+
+
+def _glob_atoms(glob: str) -> list:
+    # The regex of every character of a glob, like fnmatch.translate
+    atoms = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        i += 1
+        if c == "*":
+            if atoms[-1:] != [".*"]:
+                atoms.append(".*")
+        elif c == "?":
+            atoms.append(".")
+        elif c == "[" and "]" in glob[i + 1 :]:
+            j = glob.index("]", i + 1)
+            chars = glob[i:j].replace("\\", "\\\\")
+            if chars[0] == "!":
+                chars = "^" + chars[1:]
+            elif chars[0] == "^":
+                chars = "\\" + chars
+            atoms.append("[" + chars + "]")
+            i = j + 1
+        else:
+            atoms.append(re.escape(c))
+
+    return atoms
+
+
+def _parts(glob: str) -> list:
+    # A glob as the atoms of a search: without the leading and trailing *
+    # and anchored where there is none
+    atoms = _glob_atoms(glob)
+    atoms = ["^"] + atoms if atoms[0] != ".*" else atoms[1:]
+    atoms = atoms + [r"\Z"] if atoms[-1:] != [".*"] else atoms[:-1]
+
+    return atoms
+
+
+def _trie_pattern(sequences: list) -> str:
+    # One regex for many rules: the trie of their atoms written as nested
+    # groups, so a common start is checked once instead of once per rule
+    trie = {}
+    for atoms in sequences:
+        node = trie
+        for atom in atoms:
+            node = node.setdefault(atom, {})
+        node[""] = {}
+
+    def pattern(node) -> str:
+        # A rule that ends here is found already, whatever follows it
+        if "" in node:
+            return ""
+
+        alternatives = [atom + pattern(n) for atom, n in node.items()]
+        if len(alternatives) == 1:
+            return alternatives[0]
+
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return pattern(trie)
+
+
+def compile_rules(rules: list) -> dict:
+    # The sources of a matcher, they are cheap to keep in the diskcache
+    exact, parts, words, regexes = set(), set(), [], []
+
+    for rule in rules:
+        if rule.startswith(REGEX):
+            regex = rule[len(REGEX) :]
+            try:
+                re.compile(regex)
+            except re.error as e:
+                print(f"Invalid blacklist rule '{rule}': {e}")
+                continue
+            regexes.append(f"(?:{regex})")
+        elif rule.startswith(CONTAINS):
+            part = rule[len(CONTAINS) :].strip()
+            if part != "":
+                parts.add(tuple(re.escape(c) for c in part))
+        elif rule.startswith(WORDS):
+            words.append(sorted(set(TOKEN.findall(rule[len(WORDS) :]))))
+        elif rule.startswith(GLOB):
+            # A part of the name, like contains:, where the glob allows it.
+            # Pasted names keep their brackets, only glob: rules are globs
+            glob = rule[len(GLOB) :].strip()
+            if glob != "":
+                parts.add(tuple(_parts(glob)))
+        else:
+            exact.add(rule)
+
+    return {
+        "exact": exact,
+        "parts": _trie_pattern(sorted(parts)) if len(parts) > 0 else None,
+        "regexes": "|".join(regexes) or None,
+        "words": [w for w in words if len(w) > 0],
+    }
+
+
+def _compile(pattern):
+    return None if pattern is None else re.compile(pattern)
+
+
+class Matcher:
+    # Tells whether a product name is blacklisted. Every rule type is looked
+    # up at once: a set for the names, one regex for the parts and globs, one
+    # for the regular expressions and an index by word for the word rules
+
+    def __init__(self, source: dict):
+        self.exact = source["exact"]
+        self.parts = _compile(source["parts"])
+        self.regexes = _compile(source["regexes"])
+
+        self.words = {}  # the first word of a rule -> the rules
+        for rule in source["words"]:
+            self.words.setdefault(rule[0], []).append(set(rule))
+
+        self.seen = {}  # name -> result, the same names come up on every run
+
+    def __call__(self, name: str) -> bool:
+        if name in self.exact:
+            return True
+        if self.parts is None and self.regexes is None and len(self.words) == 0:
+            # Only names, nothing worth remembering
+            return False
+
+        result = self.seen.get(name)
+        if result is None:
+            result = self.match(name)
+            self.seen[name] = result
+
+        return result
+
+    def match(self, name: str) -> bool:
+        if self.parts is not None and self.parts.search(name):
+            return True
+        if self.regexes is not None and self.regexes.search(name):
+            return True
+
+        if len(self.words) > 0:
+            tokens = set(TOKEN.findall(name))
+            for token in tokens:
+                for rule in self.words.get(token, ()):
+                    if rule <= tokens:
+                        return True
+
+        return False
+
+
+def get_matcher(rules, cache=None) -> Matcher:
+    # Compiled once per distinct list. The scrape of the app runs in a new
+    # process every time, so the sources are also kept in the diskcache
+    if isinstance(rules, Matcher):
+        return rules
+
+    rules = list(rules)
+    key = hashlib.sha1("\n".join(rules).encode("utf-8")).hexdigest()
+    if key in _matchers:
+        return _matchers[key]
+
+    source = cache.get(("matcher", key)) if cache is not None else None
+    if source is None:
+        source = compile_rules(rules)
+        if cache is not None:
+            cache.set(("matcher", key), source)
+
+    _matchers[key] = Matcher(source)
+
+    return _matchers[key]
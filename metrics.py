@@ -0,0 +1,127 @@
+import json
+import time
+import logging
+import threading
+from collections import Counter
+
+
+LOG_FILE = "scrape.log"
+METRICS_KEY = "metrics"  # the last published snapshot in the diskcache
+PREFIX = "marktguru_"
+
+logger = logging.getLogger("marktguru")
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    # Counters and stage timings of a scrape, shared by all threads. The scrape
+    # runs in its own process, so snapshots are published through the diskcache
+
+    def __init__(self):
+        self.counters = Counter()  # (name, labels) -> value
+        self.timings = {}  # (name, labels) -> [count, sum, max]
+        self.published = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, n: int = 1, **labels) -> None:
+        with self.lock:
+            self.counters[(name, _labels(labels))] += n
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        with self.lock:
+            t = self.timings.setdefault((name, _labels(labels)), [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += seconds
+            t[2] = max(t[2], seconds)
+
+    def stage(self, stage: str, start: float) -> float:
+        # Records the time since start (perf_counter) for the stage
+        seconds = time.perf_counter() - start
+        self.observe("stage_seconds", seconds, stage=stage)
+
+        return seconds
+
+    def event(self, event: str, **fields) -> None:
+        # One JSON object per line, see log_to_file
+        fields = {
+            k: round(v, 4) if isinstance(v, float) else v for k, v in fields.items()
+        }
+        logger.info(
+            json.dumps(
+                {"ts": round(time.time(), 3), "event": event, **fields}, default=str
+            )
+        )
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.timings.clear()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "timings": {k: list(v) for k, v in self.timings.items()},
+                "updated": time.time(),
+            }
+
+    def publish(self, cache, every: float = 1.0, force: bool = False) -> None:
+        # At most once per `every` seconds, the pages come in much faster
+        now = time.monotonic()
+        if force or now - self.published >= every:
+            self.published = now
+            cache.set(METRICS_KEY, self.snapshot())
+
+
+METRICS = Metrics()
+
+
+def _format(name: str, labels: tuple) -> str:
+    if len(labels) == 0:
+        return PREFIX + name
+
+    return PREFIX + name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def render(snapshot: dict) -> str:
+    # The Prometheus text format
+    lines = []
+
+    typed = set()
+    for (name, labels), value in sorted(snapshot.get("counters", {}).items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {PREFIX}{name}_total counter")
+        lines.append(f"{_format(name + '_total', labels)} {value}")
+
+    maxima = []
+    for (name, labels), (count, total, maximum) in sorted(
+        snapshot.get("timings", {}).items()
+    ):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {PREFIX}{name} summary")
+            maxima.append(f"# TYPE {PREFIX}{name}_max gauge")
+        lines.append(f"{_format(name + '_count', labels)} {count}")
+        lines.append(f"{_format(name + '_sum', labels)} {total:.6f}")
+        maxima.append(f"{_format(name + '_max', labels)} {maximum:.6f}")
+    lines += maxima
+
+    if "updated" in snapshot:
+        lines.append(f"# TYPE {PREFIX}last_update_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}last_update_timestamp_seconds {snapshot['updated']:.3f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def log_to_file(path: str = LOG_FILE) -> None:
+    # Writes the structured events as JSON lines next to the reports
+    if not any(isinstance(h, logging.FileHandler) for h in logger.handlers):
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -0,0 +1,146 @@
+import queue
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from browser_pool import temporary_pool
+from marktguru_scraper import load_location_state
+from scraper_pool import iter_scraper_pool
+from retry import RetryPolicy
+
+
+def parse_zips(zips: str) -> list:
+    # "10713, 10115 20095" -> ["10713", "10115", "20095"]
+    return [z for z in zips.replace(",", " ").split() if z != ""]
+
+
+def _scrape_zip(
+    pool,
+    chrome_binary_location,
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    engine,
+    cache,
+    journal,
+    policy,
+    out,
+) -> None:
+    # Every location gets its own browser or HTTP session, a browser is only
+    # needed for the HTTP engines to set a location that wasn't saved yet
+    needs_browser = engine == "selenium" or load_location_state(zip_) is None
+    if needs_browser:
+        context = pool.driver(chrome_binary_location, url, zip_, shopping_list[0])
+    else:
+        context = contextlib.nullcontext(None)
+
+    with context as driver:
+        if needs_browser and driver is None:
+            print()
+            print(f"Couldn't set the location {zip_}, skipping it.")
+            print()
+            if policy is not None:
+                policy.not_scraped(shopping_list, zip_)
+            return
+
+        for index, item, page, page_results in iter_scraper_pool(
+            driver,
+            chrome_binary_location,
+            url,
+            moe,
+            shopping_list,
+            zip_,
+            1,
+            engine,
+            cache,
+            journal,
+            pool,
+            policy,
+        ):
+            page_results = [{**r, "ZIP": zip_} for r in page_results]
+            out.put((zip_, index, item, page, page_results))
+
+
+def iter_scraper_zips(
+    chrome_binary_location,
+    url,
+    moe,
+    shopping_list,
+    zips,
+    workers=1,
+    engine="selenium",
+    cache=None,
+    journals=None,
+    pool=None,
+    policy=None,
+):
+    # Yields (ZIP, item index, item, page, records) with up to `workers`
+    # locations scraped at the same time
+    out = queue.Queue()
+    journals = journals or {}
+    policy = policy or RetryPolicy()
+
+    with temporary_pool("zip", pool) as pool:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    _scrape_zip,
+                    pool,
+                    chrome_binary_location,
+                    url,
+                    moe,
+                    shopping_list,
+                    zip_,
+                    engine,
+                    cache,
+                    journals.get(zip_),
+                    policy,
+                    out,
+                ): zip_
+                for zip_ in zips
+            }
+
+            while not all(f.done() for f in futures) or not out.empty():
+                try:
+                    yield out.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+            for f, zip_ in futures.items():
+                if f.exception() is not None:
+                    print()
+                    print(f"Location {zip_} failed: {f.exception()}")
+                    print()
+
+
+def launch_scraper_zips(
+    chrome_binary_location,
+    url,
+    moe,
+    shopping_list,
+    zips,
+    workers=1,
+    engine="selenium",
+    cache=None,
+    journals=None,
+    pool=None,
+    policy=None,
+) -> list:
+    # Merges the results by ZIP, then in the order of the shopping list
+    results = {}
+    for zip_, index, _, page, page_results in iter_scraper_zips(
+        chrome_binary_location,
+        url,
+        moe,
+        shopping_list,
+        zips,
+        workers,
+        engine,
+        cache,
+        journals,
+        pool,
+        policy,
+    ):
+        results[(zips.index(zip_), index, page)] = page_results
+
+    return [result for key in sorted(results) for result in results[key]]
@@ -0,0 +1,107 @@
+import threading
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from matcher import get_matcher
+from parsers import offer_key
+from metrics import METRICS
+
+
+class OfferStream:
+    # Cleans, filters and deduplicates the offers as the pages come in. The
+    # offers are kept as columns of codes into one table of distinct values,
+    # stores, items, dates and ZIPs repeat on almost every offer
+
+    def __init__(self, item_blacklist=()):
+        # A list of rules or a matcher compiled from them, see matcher
+        self.item_blacklist = get_matcher(item_blacklist)
+        self.values = [None]  # code -> value, 0 is a missing value
+        self.codes = {None: 0}  # value -> code
+        self.columns = {}  # column -> codes, one per row
+        self.rows = 0
+        self.order = array("Q")  # item index and page of every row, see add
+        self.seen = {}  # location and offer key -> row
+        self.duplicates = 0
+        self.pages = 0
+        self.lock = threading.Lock()
+
+    def _code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+
+        return code
+
+    def _add_columns(self, r: dict) -> None:
+        for column in r:
+            if column not in self.columns and column != "Key":
+                self.columns[column] = array("I", [0]) * self.rows
+
+    def _append(self, r: dict, order: int) -> int:
+        for column, codes in self.columns.items():
+            codes.append(self._code(r.get(column)))
+        self.order.append(order)
+        self.rows += 1
+
+        return self.rows - 1
+
+    def _replace(self, row: int, r: dict, order: int) -> None:
+        for column, codes in self.columns.items():
+            codes[row] = self._code(r.get(column))
+        self.order[row] = order
+
+    def add(self, records: list, order: tuple = None) -> None:
+        # order is the (item index, page) of the records, by default the
+        # order they are added in
+        with self.lock:
+            self.pages += 1
+            index, page = order if order is not None else (0, self.pages)
+            order = index << 32 | page
+
+            for r in records:
+                # Removing empty rows because of possible scraping errors
+                if r["Name"] == "" or r["Store"] == "" or r["Price"] == "":
+                    continue
+
+                if self.item_blacklist(r["Name"]):
+                    continue
+
+                # Every column seen, whichever copy of an offer is kept
+                self._add_columns(r)
+
+                # The copy of an offer from the first item and page of the
+                # shopping list is kept, whatever order the pages finish in,
+                # the others come from overlapping pages or searches. Offers
+                # of different locations are never duplicates. Records cached
+                # before the parsers set the key get it here
+                key = self._code(r.get("ZIP")) << 128 | int(
+                    r.get("Key") or offer_key(r), 16
+                )
+                row = self.seen.get(key)
+                if row is None:
+                    self.seen[key] = self._append(r, order)
+                    continue
+
+                self.duplicates += 1
+                METRICS.inc("duplicate_offers")
+                if order < self.order[row]:
+                    self._replace(row, r, order)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def to_frame(self) -> pd.DataFrame:
+        # Straight from the columns
+        with self.lock:
+            values = np.empty(len(self.values), dtype=object)
+            values[:] = self.values
+
+            columns = {
+                c: values[np.frombuffer(codes, dtype=np.uint32)]
+                for c, codes in self.columns.items()
+            }
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.rows))
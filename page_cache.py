@@ -0,0 +1,92 @@
+import re
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+SIZE_LIMIT = 2**29  # 512 MB, least recently stored pages are evicted first
+MAX_TTL = 7 * 24 * 3600
+ITEM_TTL = 30 * 24 * 3600  # fingerprints of the first page for incremental runs
+
+# "12.12. - 18.12." or "12.12.2022 - 18.12.2022"
+DATE_RANGE = re.compile(
+    r"(\d{1,2})\.(\d{1,2})\.(\d{2,4})?\s*-\s*(\d{1,2})\.(\d{1,2})\.(\d{2,4})?"
+)
+
+
+def valid_until(date_valid: str, today: date = None):
+    today = today or date.today()
+
+    m = DATE_RANGE.search(date_valid)
+    if m is None:
+        return None
+
+    day, month, year = int(m.group(4)), int(m.group(5)), m.group(6)
+    if year is not None:
+        year = int(year)
+        year = year + 2000 if year < 100 else year
+    else:
+        # The year is left out - an end month far behind means the next year
+        year = today.year + 1 if month < today.month - 6 else today.year
+
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def page_ttl(records: list, now: datetime = None) -> float:
+    # A page is valid until the first of its offers runs out
+    now = now or datetime.now()
+    today = now.date()
+
+    ends = [valid_until(r.get("Date valid", ""), today) for r in records]
+    ends = [e for e in ends if e is not None and e >= today]
+    expires = min(ends) if len(ends) > 0 else today
+
+    ttl = (
+        datetime.combine(expires + timedelta(days=1), time.min) - now
+    ).total_seconds()
+
+    return min(ttl, MAX_TTL)
+
+
+def _key(url: str, zip_: str, item: str, page: int) -> tuple:
+    return ("page", url, zip_, item, page)
+
+
+def get_page(cache, url: str, zip_: str, item: str, page: int):
+    return cache.get(_key(url, zip_, item, page))
+
+
+def set_page(cache, url, zip_, item, page, html: str, records: list) -> None:
+    cache.set(
+        _key(url, zip_, item, page),
+        {"html": html, "records": records},
+        expire=page_ttl(records),
+    )
+
+
+def set_last_page(cache, url, zip_, item, page) -> None:
+    cache.set(_key(url, zip_, item, page), {"last": True}, expire=page_ttl([]))
+
+
+def fingerprint(records: list) -> str:
+    # Changes whenever an offer on the page is added, removed or repriced
+    lines = sorted(
+        f"{r.get('Store', '')}|{r.get('Name', '')}|{r.get('Price', '')}|"
+        f"{r.get('Date valid', '')}"
+        for r in records
+    )
+
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def get_item(cache, url: str, zip_: str, item: str):
+    return cache.get(("item", url, zip_, item))
+
+
+def set_item(cache, url, zip_, item, first_page: list, records: list) -> None:
+    cache.set(
+        ("item", url, zip_, item),
+        {"fingerprint": fingerprint(first_page), "records": records},
+        expire=ITEM_TTL,
+    )
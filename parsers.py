@@ -0,0 +1,178 @@
+import re
+import hashlib
+import functools
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+TOKEN = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=2**16)
+def _words(text: str) -> str:
+    # Stores and names repeat across pages, searches and ZIPs
+    return " ".join(TOKEN.findall(text))
+
+
+def offer_key(r: dict) -> str:
+    # The identity of an offer: the same store, product, price and validity
+    # are the same offer on whatever page or search it shows up
+    identity = "\x1f".join(
+        [
+            _words(r.get("Store", "")),
+            _words(r.get("Name", "")),
+            "".join(r.get("Price", "").split()),
+            "".join(r.get("Date valid", "").split()),
+        ]
+    )
+
+    return hashlib.blake2b(identity.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BeautifulSoupParser:
+    name = "bs4"
+
+    def parse(self, html: str, item: str) -> list:
+        results = []
+
+        bs = BeautifulSoup(html, "html.parser")
+
+        for li in bs.select("li"):
+
+            h3 = li.select("h3")
+
+            i = {}
+
+            if len(h3) > 0:
+                i["Item"] = item
+
+                i["Name"] = "".join([x.text for x in h3]).rstrip().lower()
+
+                dd = li.select("dl > dt.dates + dd")
+                i["Date valid"] = "".join([x.text for x in dd]).rstrip().lower()
+
+                a = li.select("dl > dt.retailer + dd > a")
+                if len(list(a)) == 0:
+                    span = li.select("dl > dt.retailer + dd > span")
+                    i["Store"] = "".join([x.text for x in span]).rstrip().lower()
+                else:
+                    i["Store"] = "".join([x.text for x in a]).rstrip().lower()
+
+                brand_a = li.select("dl > dt.brand + dd > a")
+                if len(list(brand_a)) == 0:
+                    brand_span = li.select("dl > dt.brand + dd > span")
+                    i["Brand"] = "".join([x.text for x in brand_span]).rstrip().lower()
+                else:
+                    i["Brand"] = "".join([x.text for x in brand_a]).rstrip().lower()
+
+                price_strong = li.select("p > strong")
+                if len(list(price_strong)) == 0:
+                    price_dd = li.select("dl > div.prices-container> dt.price + dd")
+                    price_p = li.select("p")
+
+                    i["Price"] = "".join([x.text for x in price_dd]).rstrip().lower()
+                    i["Note"] = "".join([x.text for x in price_p]).rstrip().lower()
+                else:
+                    i["Price"] = (
+                        "".join([x.text for x in price_strong])
+                        .split("-")[0]
+                        .rstrip()
+                        .lower()
+                    )
+
+                i["Key"] = offer_key(i)
+                results.append(i)
+            else:
+                continue
+
+        return results
+
+
+def _cls(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _next_dd(dt: str) -> str:
+    # XPath for the CSS "dt + dd" combinator
+    return f"{dt}/following-sibling::*[1][self::dd]"
+
+
+def _text(elements) -> str:
+    return "".join("".join(e.itertext()) for e in elements).rstrip().lower()
+
+
+class LxmlParser:
+    name = "lxml"
+
+    def __init__(self):
+        # Compiled once - the same selectors as BeautifulSoupParser
+        self.cards = etree.XPath("//li[.//h3]")
+        self.h3 = etree.XPath(".//h3")
+        self.dates = etree.XPath(_next_dd(f".//dl/dt[{_cls('dates')}]"))
+        self.store_a = etree.XPath(_next_dd(f".//dl/dt[{_cls('retailer')}]") + "/a")
+        self.store_span = etree.XPath(
+            _next_dd(f".//dl/dt[{_cls('retailer')}]") + "/span"
+        )
+        self.brand_a = etree.XPath(_next_dd(f".//dl/dt[{_cls('brand')}]") + "/a")
+        self.brand_span = etree.XPath(_next_dd(f".//dl/dt[{_cls('brand')}]") + "/span")
+        self.price_strong = etree.XPath(".//p/strong")
+        self.price_dd = etree.XPath(
+            _next_dd(f".//dl/div[{_cls('prices-container')}]/dt[{_cls('price')}]")
+        )
+        self.p = etree.XPath(".//p")
+
+    def parse(self, html: str, item: str) -> list:
+        results = []
+
+        if html.strip() == "":
+            return results
+
+        # Only visits the product cards - the li elements with a heading
+        for li in self.cards(lxml.html.document_fromstring(html)):
+            i = {}
+
+            i["Item"] = item
+            i["Name"] = _text(self.h3(li))
+            i["Date valid"] = _text(self.dates(li))
+            i["Store"] = _text(self.store_a(li) or self.store_span(li))
+            i["Brand"] = _text(self.brand_a(li) or self.brand_span(li))
+
+            price_strong = self.price_strong(li)
+            if len(price_strong) == 0:
+                i["Price"] = _text(self.price_dd(li))
+                i["Note"] = _text(self.p(li))
+            else:
+                i["Price"] = (
+                    "".join("".join(e.itertext()) for e in price_strong)
+                    .split("-")[0]
+                    .rstrip()
+                    .lower()
+                )
+
+            i["Key"] = offer_key(i)
+            results.append(i)
+
+        return results
+
+
+PARSERS = {"bs4": BeautifulSoupParser}
+if etree is not None:
+    PARSERS["lxml"] = LxmlParser
+
+DEFAULT_PARSER = "lxml" if "lxml" in PARSERS else "bs4"
+
+_instances = {}
+
+
+def get_parser(name: str = None):
+    name = name or DEFAULT_PARSER
+    if name not in _instances:
+        _instances[name] = PARSERS[name]()
+
+    return _instances[name]
@@ -0,0 +1,54 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+
+# The header style pandas' to_excel uses
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+def _header(ws, columns) -> list:
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+
+    return cells
+
+
+def _value(v):
+    # Empty strings and NaN become empty cells like with to_excel
+    if isinstance(v, str):
+        return v if v != "" else None
+
+    return None if pd.isna(v) else v
+
+
+def write_report(path: str, groups) -> str:
+    # Writes every table of groups under its own header in a single pass,
+    # rows are streamed to the file so memory doesn't grow with the report
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+
+    for e, df in enumerate(groups):
+        if e > 0:
+            ws.append([])  # blank line between the tables
+
+        ws.append(_header(ws, df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_value(v) for v in row])
+
+    wb.save(path)
+
+    return path
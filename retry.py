@@ -0,0 +1,160 @@
+import random
+import threading
+from collections import Counter
+
+from requests.exceptions import Timeout as RequestsTimeout
+from urllib3.exceptions import MaxRetryError
+from selenium.common.exceptions import (
+    WebDriverException,
+    TimeoutException,
+    InvalidSessionIdException,
+    NoSuchWindowException,
+)
+
+from metrics import METRICS
+
+
+MAX_ATTEMPTS = 3  # attempts per page
+BASE_DELAY = 1.0  # seconds before the first retry, doubled on every attempt
+MAX_DELAY = 30.0
+BREAKER_THRESHOLD = 3  # skipped pages in a row before an item is given up
+
+# Error classes
+LAST_PAGE = "last_page"
+TIMEOUT = "timeout"
+PARSE_FAILURE = "parse_failure"
+LOCATION_DRIFT = "location_drift"
+BROWSER = "browser"
+ERROR = "error"
+
+RETRYABLE = {TIMEOUT, PARSE_FAILURE, LOCATION_DRIFT, ERROR}
+
+# The browser or its chromedriver is gone, MaxRetryError is a refused
+# connection to chromedriver. Any other driver error is one of the page
+SESSION_LOST = (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    ConnectionRefusedError,
+    MaxRetryError,
+)
+SESSION_LOST_MESSAGES = ("chrome not reachable", "disconnected:")
+
+
+class EmptyResultsError(ValueError):
+    # More empty results on a page than the margin of error allows
+    pass
+
+
+class LocationDriftError(Exception):
+    # The page shows another location than the ZIP of the scrape
+    pass
+
+
+class PageSkipped(Exception):
+    # The retry policy gave up on a page
+    pass
+
+
+def classify(e: Exception) -> str:
+    if isinstance(e, AssertionError):
+        return LAST_PAGE
+    if isinstance(e, (TimeoutException, TimeoutError, RequestsTimeout)):
+        return TIMEOUT
+    if isinstance(e, EmptyResultsError):
+        return PARSE_FAILURE
+    if isinstance(e, LocationDriftError):
+        return LOCATION_DRIFT
+    if is_session_lost(e):
+        # The caller replaces the browser
+        return BROWSER
+
+    return ERROR
+
+
+def is_session_lost(e: Exception) -> bool:
+    if isinstance(e, SESSION_LOST):
+        return True
+
+    return isinstance(e, WebDriverException) and any(
+        m in str(e.msg) for m in SESSION_LOST_MESSAGES
+    )
+
+
+class RetryPolicy:
+    # Decides whether a failed page is retried and how long to wait before,
+    # and counts every outcome of the run. Shared by all pages and threads
+
+    def __init__(
+        self,
+        max_attempts=MAX_ATTEMPTS,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+        breaker_threshold=BREAKER_THRESHOLD,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.counts = Counter()
+        self.failures = Counter()  # (ZIP, item) -> skipped pages in a row
+        self.unscraped = []  # (ZIP, item) left over when the browsers stopped
+        self.lock = threading.Lock()
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.counts[key] += n
+        METRICS.inc("page_outcomes", n, outcome=key)
+
+    def not_scraped(self, items: list, zip_: str = "") -> None:
+        self.count("unscraped", len(items))
+        with self.lock:
+            self.unscraped.extend((zip_, item) for item in items)
+
+    def is_open(self, item: str, zip_: str = "") -> bool:
+        # The circuit breaker of the item at a location, open means its pages
+        # are skipped. A search failing in one ZIP may still work in another
+        return self.failures[(zip_, item)] >= self.breaker_threshold
+
+    def check(self, item: str, zip_: str = "") -> None:
+        if self.is_open(item, zip_):
+            self.count("skipped")
+            raise PageSkipped(f"too many failed pages for '{item}'")
+
+    def delay(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def on_success(self, item: str, zip_: str = "") -> None:
+        self.count("pages")
+        with self.lock:
+            self.failures[(zip_, item)] = 0
+
+    def on_error(self, e: Exception, item: str, attempt: int, zip_: str = "") -> float:
+        # Returns the delay before the next attempt, re-raises the last page
+        # and browser errors and raises PageSkipped once the page is given up
+        kind = classify(e)
+        self.count(kind)
+
+        if kind in (LAST_PAGE, BROWSER):
+            raise e
+
+        if kind not in RETRYABLE or attempt + 1 >= self.max_attempts:
+            self.count("skipped")
+            with self.lock:
+                self.failures[(zip_, item)] += 1
+                opened = self.failures[(zip_, item)] == self.breaker_threshold
+            if opened:
+                self.count("breaker_open")
+                METRICS.event("breaker_open", item=item, zip=zip_)
+
+            raise PageSkipped(f"{kind} after {attempt + 1} attempt(s): {e}") from e
+
+        self.count("retries")
+        delay = self.delay(attempt)
+        METRICS.event("retry", item=item, error=kind, attempt=attempt + 1, delay_s=delay)
+
+        return delay
+
+    def summary(self) -> str:
+        with self.lock:
+            return ", ".join(f"{k} {v}" for k, v in sorted(self.counts.items()))
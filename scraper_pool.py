@@ -0,0 +1,183 @@
+import queue
+import threading
+from functools import partial
+
+from selenium.common.exceptions import WebDriverException
+
+from browser_pool import temporary_pool
+from retry import RetryPolicy, SESSION_LOST
+from marktguru_scraper import (
+    iter_item,
+    fetch_page,
+    get_engine,
+    merge_pages,
+)
+
+
+def _work(driver, scrape, tasks, out, emitted, fetch=fetch_page) -> None:
+    while True:
+        try:
+            index, item = tasks.get_nowait()
+        except queue.Empty:
+            return
+
+        try:
+            for page, page_results in scrape(driver, item=item, fetch=fetch):
+                # A retried item doesn't send its pages twice
+                if (index, page) not in emitted:
+                    emitted.add((index, page))
+                    out.put((index, item, page, page_results))
+        except (WebDriverException, *SESSION_LOST) as e:
+            # The browser is gone - hands the item over to the other workers
+            print(e)
+            tasks.put((index, item))
+            return
+
+
+def _spawn_worker(
+    pool, chrome_binary_location, url, shopping_list, zip_, scrape, tasks, out, emitted
+):
+    try:
+        # Picks up the location saved by the first driver
+        with pool.driver(chrome_binary_location, url, zip_, shopping_list[0]) as driver:
+            if driver is None:
+                return
+            _work(driver, scrape, tasks, out, emitted, pool.counted(fetch_page))
+    except (WebDriverException, RuntimeError, *SESSION_LOST) as e:
+        print(e)
+
+
+def iter_scraper_pool(
+    driver,
+    chrome_binary_location,
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    workers=1,
+    engine="selenium",
+    cache=None,
+    journal=None,
+    pool=None,
+    policy=None,
+):
+    # Yields (item index, item, page, records) in the order the pages finish,
+    # the extra browsers come from the pool, a temporary one if none is given
+    if engine == "async":
+        from async_pipeline import iter_scraper_async
+
+        yield from iter_scraper_async(
+            url, moe, shopping_list, zip_, cache=cache, journal=journal, policy=policy
+        )
+        return
+
+    # The given driver must already have the location set
+    tasks = queue.Queue()
+    for index, item in enumerate(shopping_list):
+        tasks.put((index, item))
+
+    out = queue.Queue()
+    emitted = set()
+
+    driver, fetch = get_engine(driver, zip_, engine)
+    policy = policy or RetryPolicy()
+    scrape = partial(
+        iter_item,
+        url=url,
+        moe=moe,
+        zip_=zip_,
+        cache=cache,
+        journal=journal,
+        policy=policy,
+    )
+
+    workers = min(workers, len(shopping_list))
+    with temporary_pool("worker", pool) as pool:
+        if engine == "selenium":
+            fetch = pool.counted(fetch)
+
+        threads = [
+            threading.Thread(
+                target=_work,
+                args=(driver, scrape, tasks, out, emitted, fetch),
+                daemon=True,
+            )
+        ]
+        if engine == "http":
+            # All workers share the pooled HTTP session
+            threads += [
+                threading.Thread(
+                    target=_work,
+                    args=(driver, scrape, tasks, out, emitted, fetch),
+                    daemon=True,
+                )
+                for _ in range(1, workers)
+            ]
+        else:
+            threads += [
+                threading.Thread(
+                    target=_spawn_worker,
+                    args=(
+                        pool,
+                        chrome_binary_location,
+                        url,
+                        shopping_list,
+                        zip_,
+                        scrape,
+                        tasks,
+                        out,
+                        emitted,
+                    ),
+                    daemon=True,
+                )
+                for _ in range(1, workers)
+            ]
+        for t in threads:
+            t.start()
+
+        while any(t.is_alive() for t in threads) or not out.empty():
+            try:
+                yield out.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    if not tasks.empty():
+        # Left for the caller to report, see RetryPolicy.unscraped
+        items = sorted(tasks.queue)
+        policy.not_scraped([item for _, item in items], zip_)
+        print()
+        print("Some items were not scraped - all browsers stopped.")
+        print()
+
+
+def launch_scraper_pool(
+    driver,
+    chrome_binary_location,
+    url,
+    moe,
+    shopping_list,
+    zip_,
+    workers=1,
+    engine="selenium",
+    cache=None,
+    journal=None,
+    pool=None,
+    policy=None,
+):
+    # Merges the results in the order of the shopping list
+    return merge_pages(
+        iter_scraper_pool(
+            driver,
+            chrome_binary_location,
+            url,
+            moe,
+            shopping_list,
+            zip_,
+            workers,
+            engine,
+            cache,
+            journal,
+            pool,
+            policy,
+        )
+    )
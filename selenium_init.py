@@ -1,42 +1,200 @@
 import os
+import time
+import socket
 import contextlib
+import subprocess
+import urllib.request
 
 from selenium.webdriver import Chrome
 from selenium.webdriver import ChromeOptions
 
 
-def get_driver(chrome_binary_location, headless=False):
-    options = ChromeOptions()
+# Only the HTML is scraped, so the lean profile doesn't load images, fonts,
+# the consent manager, ads and trackers
+LEAN = True
+
+BLOCKED_HOSTS = [
+    "usercentrics.eu",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagservices.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "criteo.net",
+    "facebook.net",
+    "hotjar.com",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com",
+]
+
+# Resources of the site itself, blocked through DevTools
+BLOCKED_URLS = [
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.avif",
+    "*.mp4",
+]
 
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-backgrounding-occluded-windows")
-    options.add_argument("--disable-background-timer-throttling")
-    options.add_argument("--disable-renderer-backgrounding")
+
+def get_arguments(headless=False, profile="Chrome", lean=LEAN) -> list:
+    arguments = [
+        "--start-maximized",
+        "--disable-backgrounding-occluded-windows",
+        "--disable-background-timer-throttling",
+        "--disable-renderer-backgrounding",
+    ]
 
     if headless == True:
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--headless=chrome")
-        options.add_argument("--disable-gpu")
+        arguments += [
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--headless=chrome",
+            "--disable-gpu",
+        ]
+
+    wd = os.path.join(os.getcwd(), profile)
+    arguments += [
+        rf"user-data-dir={wd}",
+        "profile-directory=Profile",
+        "--log-level=3",
+    ]
+
+    if lean:
+        rules = [f"MAP {h} ~NOTFOUND, MAP *.{h} ~NOTFOUND" for h in BLOCKED_HOSTS]
+        arguments += [
+            "--blink-settings=imagesEnabled=false",
+            "--host-resolver-rules=" + ", ".join(rules),
+        ]
+
+    return arguments
+
+
+def get_options(chrome_binary_location, headless=False, profile="Chrome", lean=LEAN):
+    options = ChromeOptions()
 
-    wd = os.path.join(os.getcwd(), "Chrome")
-    options.add_argument(rf"user-data-dir={wd}")
-    options.add_argument("profile-directory=Profile")
-    options.add_argument("--log-level=3")
+    for argument in get_arguments(headless, profile, lean):
+        options.add_argument(argument)
 
     options.binary_location = chrome_binary_location
 
+    return options
+
+
+def execute_cdp_cmd(driver, cmd: str, params: dict = None) -> dict:
+    # Selenium 3 has no execute_cdp_cmd, chromedriver has the endpoint though
+    driver.command_executor._commands["executeCdpCommand"] = (
+        "POST",
+        "/session/$sessionId/goog/cdp/execute",
+    )
+
+    response = driver.execute(
+        "executeCdpCommand", {"cmd": cmd, "params": params or {}}
+    )
+
+    return response["value"]
+
+
+def block_resources(driver) -> None:
+    execute_cdp_cmd(driver, "Network.enable")
+    execute_cdp_cmd(driver, "Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+
+
+def get_driver(chrome_binary_location, headless=False, profile="Chrome", lean=LEAN):
     driver = Chrome(
-        options=options,
+        options=get_options(chrome_binary_location, headless, profile, lean),
+    )
+
+    if lean:
+        block_resources(driver)
+
+    return driver
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_chrome(
+    chrome_binary_location, headless, profile, port, timeout=30, lean=LEAN
+):
+    # Starts a Chrome that outlives this process, drivers attach to it
+    # through the DevTools port, see attach_driver
+    arguments = [
+        "--" + argument.lstrip("-")
+        for argument in get_arguments(headless, profile, lean)
+    ]
+    arguments += [
+        f"--remote-debugging-port={port}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "about:blank",
+    ]
+
+    if os.name == "nt":
+        detach = {
+            "creationflags": subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    else:
+        detach = {"start_new_session": True}
+
+    process = subprocess.Popen(
+        [chrome_binary_location] + arguments,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **detach,
     )
 
+    # Waits for the DevTools endpoint instead of a fixed delay
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{port}/json/version", timeout=1
+            ):
+                return process.pid
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError(f"Chrome didn't start on port {port}")
+
+
+def attach_driver(port, lean=LEAN):
+    # quit() on an attached driver only ends the chromedriver session,
+    # the browser keeps running
+    options = ChromeOptions()
+    options.add_experimental_option("debuggerAddress", f"127.0.0.1:{port}")
+
+    driver = Chrome(options=options)
+
+    # The blocked URLs belong to the DevTools session, so every attach sets them
+    if lean:
+        block_resources(driver)
+
     return driver
 
 
 @contextlib.contextmanager
-def Driver(chrome_binary_location, headless):
-    d = get_driver(chrome_binary_location, headless)
+def Driver(chrome_binary_location, headless, profile="Chrome", lean=LEAN):
+    d = get_driver(chrome_binary_location, headless, profile, lean)
     try:
         yield d
     finally:
-        d.close()
+        # close() only closes the window and leaves chromedriver running
+        d.quit()
@@ -0,0 +1,95 @@
+# The async pipeline against the stub site, without pagination links it
+# fetches windows of pages and has to stop on its own
+#
+#   python -m pytest -q
+
+import re
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from benchmarks import stub_site
+from marktguru_scraper import LOCATION_STATE_DIR
+from async_pipeline import launch_scraper_async
+from retry import RetryPolicy
+
+
+ZIP = "10713"
+PAGE_LINK = re.compile(r'<a href="/search/[^"]*page=\d+">\d+</a>')
+
+
+@pytest.fixture(autouse=True)
+def location(tmp_path, monkeypatch):
+    # The HTTP session starts from a saved location
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / LOCATION_STATE_DIR).mkdir()
+    with open(tmp_path / LOCATION_STATE_DIR / f"{ZIP}.json", "w") as f:
+        json.dump(stub_site.location_state(ZIP), f)
+
+
+def serve(status_after: int = 200, pages: int = 3):
+    # Pages without pagination links, the ones from page `pages` on answer
+    # with `status_after`, or as the page after the last one for 200
+    class Handler(stub_site.StubHandler):
+        def do_GET(self):
+            page = int(re.search(r"page=(\d+)", self.path).group(1))
+            if page >= pages and status_after != 200:
+                self.send(status_after, "")
+                return
+
+            html = stub_site.search_page("butter", page, ZIP, pages)
+            self.send(200, PAGE_LINK.sub("", html))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def scrape(server, policy: RetryPolicy) -> list:
+    result = []
+    t = threading.Thread(
+        target=lambda: result.extend(
+            launch_scraper_async(
+                stub_site.stub_url(server),
+                0,
+                ["butter"],
+                ZIP,
+                concurrency=4,
+                rate=1000,
+                policy=policy,
+            )
+        ),
+        daemon=True,
+    )
+    t.start()
+    t.join(20)
+    server.shutdown()
+
+    assert not t.is_alive(), "the pipeline didn't stop"
+
+    return result
+
+
+def test_last_page():
+    policy = RetryPolicy(base_delay=0)
+
+    assert len(scrape(serve(), policy)) == 3 * stub_site.CARDS
+    assert policy.counts["last_page"] > 0
+
+
+def test_stops_once_the_breaker_opens():
+    policy = RetryPolicy(base_delay=0)
+
+    assert len(scrape(serve(500, pages=1), policy)) == stub_site.CARDS
+    assert policy.is_open("butter", ZIP)
+
+
+def test_stops_after_a_window_without_offers():
+    # Failing pages past the end, the breaker never opens
+    policy = RetryPolicy(base_delay=0, breaker_threshold=10**6)
+
+    assert len(scrape(serve(404), policy)) == 3 * stub_site.CARDS
@@ -0,0 +1,87 @@
+# Resuming from the journal, also after a crash in the middle of a line
+#
+#   python -m pytest -q
+
+import pytest
+
+from checkpoint import Journal
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The journals are written to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def journal() -> Journal:
+    return Journal("https://example.com/search", "10713", ["butter", "milch"])
+
+
+def test_resume():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "butter"}])
+    j.add_page("butter", 1, [{"Name": "rama"}])
+    j.finish_item("butter")
+    j.add_page("milch", 0, [{"Name": "milch"}])
+
+    j = journal()
+    assert j.is_done("butter")
+    assert not j.is_done("milch")
+    assert j.records("butter") == [{"Name": "butter"}, {"Name": "rama"}]
+    assert j.pages("milch") == [[{"Name": "milch"}]]
+
+
+def test_pages_in_a_row_from_the_first():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "a"}])
+    j.add_page("butter", 2, [{"Name": "c"}])
+
+    assert journal().pages("butter") == [[{"Name": "a"}]]
+
+
+def test_records_are_not_kept_in_memory():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "rama"}])
+
+    assert "rama" not in repr(j.items)
+    assert j.pages("butter") == [[{"Name": "rama"}]]
+
+
+def test_torn_last_line():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "butter"}])
+    with open(j.path, "a", encoding="utf-8") as f:
+        f.write('{"item": "butter", "page": 1, "rec')
+
+    # The cut off line is dropped, the next entry starts on its own line
+    j = journal()
+    assert j.pages("butter") == [[{"Name": "butter"}]]
+    j.add_page("butter", 1, [{"Name": "rama"}])
+
+    assert journal().records("butter") == [{"Name": "butter"}, {"Name": "rama"}]
+
+
+def test_bad_lines_are_skipped():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "butter"}])
+    with open(j.path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+    j.add_page("butter", 1, [{"Name": "rama"}])
+
+    assert journal().records("butter") == [{"Name": "butter"}, {"Name": "rama"}]
+
+
+def test_clear():
+    j = journal()
+    j.add_page("butter", 0, [{"Name": "butter"}])
+    j.clear()
+
+    assert j.pages("butter") == []
+    assert journal().pages("butter") == []
+
+
+def test_journals_by_location():
+    journal().add_page("butter", 0, [{"Name": "butter"}])
+
+    other = Journal("https://example.com/search", "10115", ["butter", "milch"])
+    assert other.pages("butter") == []
@@ -0,0 +1,88 @@
+# The rule types of the blacklist and the translation of the globs
+#
+#   python -m pytest -q
+
+import pytest
+
+from matcher import compile_rules, get_matcher, Matcher, _parts
+
+
+RULES = [
+    "rama original",
+    "kinder riegel [10er]",
+    "contains:bio",
+    "words:milch frische",
+    "glob:*butter*",
+    "glob:kaffee ?",
+    "glob:tee [!g]*",
+    r"re:^\d+ x ",
+]
+
+
+@pytest.mark.parametrize(
+    "name, blacklisted",
+    [
+        # Exact names, brackets included
+        ("rama original", True),
+        ("rama original 500 g", False),
+        ("kinder riegel [10er]", True),
+        ("kinder riegel 1", False),
+        # Parts
+        ("bio joghurt", True),
+        ("joghurt", False),
+        # All of the words, in any order
+        ("frische milch 3,5 %", True),
+        ("milch", False),
+        # Globs match the whole name
+        ("kräuterbutter", True),
+        ("kaffee x", True),
+        ("kaffee xl", False),
+        ("tee schwarz", True),
+        ("tee grün", False),
+        # Regular expressions anywhere in the name
+        ("6 x 1,5 l wasser", True),
+        ("wasser 6 x 1,5 l", False),
+    ],
+)
+def test_rules(name, blacklisted):
+    assert Matcher(compile_rules(RULES))(name) is blacklisted
+
+
+def test_globs_need_the_prefix():
+    source = compile_rules(["*butter*", "glob:"])
+
+    assert source["exact"] == {"*butter*"}
+    assert source["parts"] is None
+
+
+def test_invalid_regex_is_skipped():
+    source = compile_rules(["re:(", "re:ok"])
+
+    assert source["regexes"] == "(?:ok)"
+
+
+@pytest.mark.parametrize(
+    "glob, atoms",
+    [
+        ("*butter*", ["b", "u", "t", "t", "e", "r"]),
+        ("butter*", ["^", "b", "u", "t", "t", "e", "r"]),
+        ("*a?", ["a", ".", r"\Z"]),
+        ("[!a]b", ["^", "[^a]", "b", r"\Z"]),
+        ("a[b", ["^", "a", r"\[", "b", r"\Z"]),
+    ],
+)
+def test_glob_translation(glob, atoms):
+    assert _parts(glob) == atoms
+
+
+def test_matchers_are_reused():
+    class Cache(dict):
+        def set(self, key, value):
+            self[key] = value
+
+    cache = Cache()
+    matcher = get_matcher(["glob:reuse *"], cache)
+
+    assert get_matcher(["glob:reuse *"]) is matcher
+    assert len(cache) == 1
+    assert get_matcher(matcher) is matcher
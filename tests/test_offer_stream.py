@@ -0,0 +1,111 @@
+# Cleaning, filtering and deduplicating the offers of the stream
+#
+#   python -m pytest -q
+
+import itertools
+
+from offer_stream import OfferStream
+from parsers import offer_key
+
+
+def offer(item: str, name: str = "butter 250 g", **fields) -> dict:
+    r = {
+        "Item": item,
+        "Name": name,
+        "Date valid": "12.12. - 18.12.",
+        "Store": "rewe",
+        "Brand": "",
+        "Price": "€ 1,99",
+        **fields,
+    }
+    r["Key"] = offer_key(r)
+
+    return r
+
+
+def test_empty_and_blacklisted_offers_are_dropped():
+    data = OfferStream(["contains:bio"])
+    data.add(
+        [
+            offer("butter"),
+            offer("butter", name=""),
+            offer("butter", Store=""),
+            offer("butter", Price=""),
+            offer("butter", name="bio butter"),
+        ]
+    )
+
+    assert len(data) == 1
+    assert "Key" not in data.to_frame().columns
+
+
+def test_duplicates_across_pages_and_items():
+    data = OfferStream()
+    data.add([offer("butter"), offer("butter")], (0, 0))
+    data.add([offer("butter")], (0, 1))
+    data.add([offer("rama")], (1, 0))
+
+    assert len(data) == 1
+    assert data.duplicates == 3
+
+
+def test_first_item_and_page_is_kept_in_any_order():
+    pages = [
+        ([offer("rama", Note="rama")], (1, 0)),
+        ([offer("butter", Note="page 1")], (0, 1)),
+        ([offer("butter", Note="page 0")], (0, 0)),
+        ([offer("butter")], (2, 0)),
+    ]
+
+    frames = []
+    for order in itertools.permutations(pages):
+        data = OfferStream()
+        for records, page in order:
+            data.add(records, page)
+        frames.append(data.to_frame().to_dict("records"))
+
+    assert all(frame == frames[0] for frame in frames)
+    assert frames[0] == [
+        {
+            "Item": "butter",
+            "Name": "butter 250 g",
+            "Date valid": "12.12. - 18.12.",
+            "Store": "rewe",
+            "Brand": "",
+            "Price": "€ 1,99",
+            "Note": "page 0",
+        }
+    ]
+
+
+def test_locations_are_never_duplicates():
+    data = OfferStream()
+    data.add([offer("butter", ZIP="10713")], (0, 0))
+    data.add([offer("butter", ZIP="10115")], (0, 0))
+    data.add([offer("butter", ZIP="10115")], (0, 1))
+
+    assert data.to_frame()["ZIP"].tolist() == ["10713", "10115"]
+    assert data.duplicates == 1
+
+
+def test_records_without_a_key():
+    r = offer("butter")
+    del r["Key"]
+
+    data = OfferStream()
+    data.add([r, offer("butter")])
+
+    assert len(data) == 1
+
+
+def test_other_stores_and_prices_are_kept():
+    data = OfferStream()
+    data.add(
+        [
+            offer("butter"),
+            offer("butter", Store="lidl"),
+            offer("butter", Price="€ 1,49"),
+        ]
+    )
+
+    assert len(data) == 3
@@ -0,0 +1,41 @@
+# Both parsers against saved search pages. The expected offers are what the
+# BeautifulSoup parse_page of the scraper returned before the parsers module,
+# with the offer keys added
+#
+#   python -m pytest -q
+
+import os
+import json
+
+import pytest
+
+from parsers import PARSERS, get_parser
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# page -> the item it was searched for
+PAGES = {
+    "stub_search": "butter",  # rendered by benchmarks/stub_site
+    "offers_page": "milch",
+}
+
+
+def load(page: str) -> tuple:
+    with open(os.path.join(FIXTURES, f"{page}.html"), encoding="utf-8") as f:
+        html = f.read()
+    with open(os.path.join(FIXTURES, f"{page}.expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+
+    return html, expected
+
+
+@pytest.mark.parametrize("parser", ["bs4", "lxml"])
+@pytest.mark.parametrize("page", sorted(PAGES))
+def test_parse_page(parser, page):
+    if parser not in PARSERS:
+        pytest.skip(f"{parser} is not installed")
+
+    html, expected = load(page)
+
+    assert get_parser(parser).parse(html, PAGES[page]) == expected
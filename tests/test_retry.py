@@ -0,0 +1,98 @@
+# The error classes, retries and the circuit breaker of the retry policy
+#
+#   python -m pytest -q
+
+import pytest
+from urllib3.exceptions import MaxRetryError
+from selenium.common.exceptions import (
+    WebDriverException,
+    TimeoutException,
+    JavascriptException,
+    InvalidSessionIdException,
+    NoSuchWindowException,
+)
+
+from retry import (
+    RetryPolicy,
+    PageSkipped,
+    EmptyResultsError,
+    LocationDriftError,
+    classify,
+)
+
+
+@pytest.mark.parametrize(
+    "e, kind",
+    [
+        (AssertionError(), "last_page"),
+        (TimeoutException(), "timeout"),
+        (EmptyResultsError(), "parse_failure"),
+        (LocationDriftError(), "location_drift"),
+        (WebDriverException("unknown error: net::ERR_CONNECTION_RESET"), "error"),
+        (JavascriptException("javascript error"), "error"),
+        (ValueError(), "error"),
+        (InvalidSessionIdException(), "browser"),
+        (NoSuchWindowException(), "browser"),
+        (WebDriverException("chrome not reachable"), "browser"),
+        (ConnectionRefusedError(), "browser"),
+        (MaxRetryError(None, "http://127.0.0.1:9515/session"), "browser"),
+    ],
+)
+def test_classify(e, kind):
+    assert classify(e) == kind
+
+
+def policy() -> RetryPolicy:
+    return RetryPolicy(max_attempts=2, base_delay=0, breaker_threshold=2)
+
+
+def skip(p: RetryPolicy, item: str, zip_: str = "") -> None:
+    with pytest.raises(PageSkipped):
+        p.on_error(ValueError(), item, p.max_attempts - 1, zip_)
+
+
+def test_retries_then_skips():
+    p = policy()
+
+    assert p.on_error(TimeoutException(), "butter", 0) == 0
+    skip(p, "butter")
+    assert p.counts == {"timeout": 1, "retries": 1, "error": 1, "skipped": 1}
+
+
+@pytest.mark.parametrize("e", [AssertionError(), InvalidSessionIdException()])
+def test_last_page_and_browser_errors_are_raised(e):
+    with pytest.raises(type(e)):
+        policy().on_error(e, "butter", 0)
+
+
+def test_breaker_opens_after_skipped_pages_in_a_row():
+    p = policy()
+    skip(p, "butter")
+    p.on_success("butter")
+    skip(p, "butter")
+    assert not p.is_open("butter")
+
+    skip(p, "butter")
+    assert p.is_open("butter")
+    assert p.counts["breaker_open"] == 1
+    with pytest.raises(PageSkipped):
+        p.check("butter")
+
+
+def test_breaker_by_location_and_item():
+    p = policy()
+    skip(p, "butter", "10713")
+    skip(p, "butter", "10713")
+
+    assert p.is_open("butter", "10713")
+    assert not p.is_open("butter", "10115")
+    assert not p.is_open("milch", "10713")
+    p.check("butter", "10115")
+
+
+def test_not_scraped():
+    p = policy()
+    p.not_scraped(["butter", "milch"], "10713")
+
+    assert p.unscraped == [("10713", "butter"), ("10713", "milch")]
+    assert p.counts["unscraped"] == 2
@@ -0,0 +1,80 @@
+# Prices per kg, l or piece and the lowest price flags built on them
+#
+#   python -m pytest -q
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from unit_price import unit_prices
+from marktguru_scraper import flag_lowest_prices
+
+
+def offers(*rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["Item", "Name", "Price", "Unit", "Note"])
+
+
+@pytest.mark.parametrize(
+    "name, price, unit, note, unit_price, base",
+    [
+        # A base price on the offer wins
+        ("butter 250 g", 1.99, None, "1 kg = € 7,96", 7.96, "kg"),
+        ("kaffee", 4.99, None, "100 g = 0,80 €", 8.0, "kg"),
+        # The unit after the price
+        ("milch", 1.29, " l", None, 1.29, "l"),
+        ("joghurt", 0.99, " 100 g", None, 9.9, "kg"),
+        # The pack size in the note, then in the name
+        ("milsani h-milch", 0.99, None, "1,5 %, 1 l", 0.99, "l"),
+        ("wasser 6 x 1,5 l", 2.7, None, None, 0.3, "l"),
+        ("eier 10 stück", 2.5, None, "", 0.25, "piece"),
+        ("reis 1 kg", 1.0, None, "500 g", 2.0, "kg"),
+        # Nothing tells the pack size
+        ("brot", 2.49, None, "frisch", np.nan, np.nan),
+    ],
+)
+def test_unit_prices(name, price, unit, note, unit_price, base):
+    found = unit_prices(offers(("x", name, price, unit, note))).iloc[0]
+
+    assert found["Unit price"] == pytest.approx(unit_price, nan_ok=True)
+    assert found["Base unit"] == base or (pd.isna(base) and pd.isna(found["Base unit"]))
+
+
+def test_unit_prices_are_not_rounded():
+    found = unit_prices(offers(("x", "kaffee 3 kg", 10.01, None, None)))
+
+    assert found["Unit price"].iloc[0] == pytest.approx(10.01 / 3)
+
+
+def compare(df: pd.DataFrame, compare: str) -> list:
+    return flag_lowest_prices(df.join(unit_prices(df)), "Item", compare).tolist()
+
+
+def test_lowest_unit_price():
+    df = offers(
+        ("kaffee", "kaffee 500 g", 4.0, None, None),
+        ("kaffee", "kaffee 1 kg", 6.0, None, None),
+        ("kaffee", "kaffee pads", 2.0, None, None),
+    )
+
+    # The pads have no pack size and are compared by their pack price
+    assert compare(df, "unit") == ["", "✅ kaffee", "✅ kaffee"]
+    assert compare(df, "pack") == ["", "", "✅ kaffee"]
+
+
+def test_lowest_unit_price_less_than_a_cent_apart():
+    df = offers(
+        ("kaffee", "kaffee 3 kg", 10.0, None, None),
+        ("kaffee", "kaffee 3 kg", 10.01, None, None),
+    )
+
+    assert compare(df, "unit") == ["✅ kaffee", ""]
+
+
+def test_lowest_price_per_location():
+    df = offers(
+        ("milch", "milch 1 l", 1.0, None, None),
+        ("milch", "milch 1 l", 2.0, None, None),
+    )
+    df["ZIP"] = ["10713", "10115"]
+
+    assert compare(df, "unit") == ["✅ milch", "✅ milch"]
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+# Units of the pack sizes and base prices -> (base unit, factor)
+UNITS = {
+    "kg": ("kg", 1.0),
+    "g": ("kg", 0.001),
+    "gr": ("kg", 0.001),
+    "gramm": ("kg", 0.001),
+    "l": ("l", 1.0),
+    "ltr": ("l", 1.0),
+    "liter": ("l", 1.0),
+    "ml": ("l", 0.001),
+    "cl": ("l", 0.01),
+    "st": ("piece", 1.0),
+    "stk": ("piece", 1.0),
+    "stück": ("piece", 1.0),
+}
+
+BASE = {u: b for u, (b, _) in UNITS.items()}
+FACTOR = {u: f for u, (_, f) in UNITS.items()}
+
+_UNIT = "(?P<unit>" + "|".join(sorted(UNITS, key=len, reverse=True)) + r")\b\.?"
+_AMOUNT = r"(?P<amount>\d+(?:[.,]\d+)?)"
+
+# "1 kg = € 3,98", "100 g = 0,40 €"
+BASE_PRICE = (
+    rf"(?<![\d.,]){_AMOUNT}?\s*{_UNIT}\s*=\s*(?:€\s*)?(?P<price>\d+(?:[.,]\d+)?)"
+)
+# The unit after the "/" of the price: "€ 1,29 / l", "€ 0,99 / 100 g"
+PRICE_UNIT = rf"^\s*{_AMOUNT}?\s*{_UNIT}"
+# "500 g", "1,5 l", "6 x 1,5 l", "10 stück", not followed by a base price
+PACK_SIZE = rf"(?<![\d.,])(?:(?P<count>\d+)\s*[x×]\s*)?{_AMOUNT}\s*-?\s*{_UNIT}(?!\s*=)"
+
+
+def _number(s: pd.Series, default: float = np.nan):
+    if s is None:
+        return default
+
+    return pd.to_numeric(
+        s.str.replace(",", ".", regex=False), errors="coerce"
+    ).fillna(default)
+
+
+def _parse(text: pd.Series, pattern: str) -> pd.DataFrame:
+    # The amount in its base unit, the base unit and the price of a base price
+    # of every string. Worked out once per distinct string, they repeat a lot
+    codes, uniques = pd.factorize(text.fillna("").astype(str))
+    found = pd.Series(uniques, dtype=object).str.extract(pattern)
+
+    amount = (
+        _number(found.get("count"), 1.0)
+        * _number(found["amount"], 1.0)
+        * found["unit"].map(FACTOR).astype(float)
+    )
+    parsed = pd.DataFrame(
+        {
+            "amount": amount,
+            "base": found["unit"].map(BASE),
+            "price": _number(found.get("price")),
+        }
+    ).iloc[codes]
+    parsed.index = text.index
+
+    return parsed
+
+
+def unit_prices(df: pd.DataFrame) -> pd.DataFrame:
+    # The price per kg, l or piece of every offer, NaN where neither the note,
+    # the unit nor the name tells the pack size. Columns "Unit price" and
+    # "Base unit", the price is not rounded so close offers still compare.
+    # Expects Price as a number, see parse_prices
+    price = df["Price"].astype(float)
+    empty = pd.Series("", index=df.index)
+
+    # A base price on the offer wins, the site already did the math
+    hint = _parse(df.get("Note", empty), BASE_PRICE)
+    per_hint = hint["price"] / hint["amount"]
+
+    # A price per unit, "€ 1,29 / l"
+    unit = _parse(df.get("Unit", empty), PRICE_UNIT)
+    per_unit = price / unit["amount"]
+
+    # The pack size in the note, "1,5 %, 1 l", then in the name
+    note = _parse(df.get("Note", empty), PACK_SIZE)
+    per_note = price / note["amount"].where(note["amount"] > 0)
+
+    pack = _parse(df["Name"], PACK_SIZE)
+    per_pack = price / pack["amount"].where(pack["amount"] > 0)
+
+    unit_price = per_hint.fillna(per_unit).fillna(per_note).fillna(per_pack)
+    base = hint["base"].where(per_hint.notna(), unit["base"])
+    base = base.where(per_hint.notna() | per_unit.notna(), note["base"])
+    base = base.where(
+        per_hint.notna() | per_unit.notna() | per_note.notna(), pack["base"]
+    )
+
+    return pd.DataFrame(
+        {
+            "Unit price": unit_price,
+            "Base unit": base.where(unit_price.notna()),
+        },
+        index=df.index,
+    )